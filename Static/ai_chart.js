@@ -210,7 +210,9 @@ chartGrid.addEventListener('click', async (e) => {
         data: data,
         options: {
             responsive: true,
-            maintainAspectRatio: false
+            maintainAspectRatio: false,
+            // Datetime x axes come back bucketed; show which bucket size was used
+            scales: data.granularity ? { x: { title: { display: true, text: `${config.x_column} (per ${data.granularity})` } } } : undefined
         }
     });
     activeCharts.push(chart);
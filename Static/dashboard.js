@@ -24,6 +24,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     let activeChartModule = null;
     let chartIdCounter = 0;
+    let chartRequestCounter = 0;
     const chartInstances = {}; // Stores Chart.js instances { chartId: instance }
 
     // --- INITIAL SETUP & EVENT LISTENERS ---
@@ -122,10 +123,14 @@ document.addEventListener('DOMContentLoaded', () => {
         });
         const aggSelect = wellsContainer.querySelector('[name="agg_func"]');
         if (aggSelect && config.agg_func) aggSelect.value = config.agg_func;
+        const granularitySelect = wellsContainer.querySelector('[name="granularity"]');
+        if (granularitySelect && config.granularity) granularitySelect.value = config.granularity;
         const showLineCheckbox = wellsContainer.querySelector('[name="showLine"]');
         if (showLineCheckbox && typeof config.showLine === 'boolean') showLineCheckbox.checked = config.showLine;
         const binsInput = wellsContainer.querySelector('[name="bins"]');
         if (binsInput && config.bins) binsInput.value = config.bins;
+        const binScaleSelect = wellsContainer.querySelector('[name="bin_scale"]');
+        if (binScaleSelect && config.bin_scale) binScaleSelect.value = config.bin_scale;
     }
 
 
@@ -226,30 +231,48 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // --- CHART GENERATION AND API CALLS ---
 
+    async function fetchChartData(config) {
+        const response = await fetch('/api/generate-chart', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(config)
+        });
+        const responseData = await response.json();
+        if (!response.ok) throw new Error(responseData.error || 'Failed to fetch chart data');
+        return responseData;
+    }
+
     async function triggerChartUpdateForActiveModule() {
         if (!activeChartModule) return;
-        const chartType = activeChartModule.dataset.chartType;
+        const module = activeChartModule;
+        const chartType = module.dataset.chartType;
         const currentConfig = buildConfigFromWells(chartType);
         
-        activeChartModule.dataset.config = JSON.stringify(currentConfig);
+        module.dataset.config = JSON.stringify(currentConfig);
 
         if (!isConfigComplete(chartType, currentConfig)) {
-            renderChartInModule(activeChartModule, null, 'Please add fields to all required wells.');
+            renderChartInModule(module, null, 'Please add fields to all required wells.');
             return;
         }
 
+        // Progressive refinement: draw a quick estimate from the sample first, then swap in the
+        // exact chart. A newer request for the same chart makes the older answers stale.
+        const requestId = String(++chartRequestCounter);
+        module.dataset.requestId = requestId;
         try {
-            const response = await fetch('/api/generate-chart', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(currentConfig)
-            });
-            const responseData = await response.json();
-            if (!response.ok) throw new Error(responseData.error || 'Failed to fetch chart data');
-            renderChartInModule(activeChartModule, responseData);
+            const estimate = await fetchChartData({ ...currentConfig, approximate: true });
+            if (module.dataset.requestId !== requestId) return;
+            renderChartInModule(module, estimate);
+            if (!estimate.approximate) return;
+
+            const exact = await fetchChartData(currentConfig);
+            if (module.dataset.requestId !== requestId) return;
+            renderChartInModule(module, exact);
         } catch (error) {
             console.error('Chart update failed:', error);
-            renderChartInModule(activeChartModule, null, `Error: ${error.message}`);
+            if (module.dataset.requestId === requestId) {
+                renderChartInModule(module, null, `Error: ${error.message}`);
+            }
         }
     }
     
@@ -325,6 +348,25 @@ document.addEventListener('DOMContentLoaded', () => {
             options.scales = { x: { grid: { offset: false } }, y: { beginAtZero: true } };
         } else {
             options.scales = { y: { beginAtZero: true } };
+            // Datetime x axes come back bucketed; tell the user which bucket size was used
+            if (chartData.granularity) {
+                options.scales.x = { title: { display: true, text: `${userConfig.x_axis} (per ${chartData.granularity})` } };
+            }
+        }
+
+        // Estimated charts say so, and show the 95% confidence interval in the tooltip
+        if (chartData.approximate) {
+            const { sample_rows, total_rows } = chartData.approximate;
+            options.plugins.subtitle = { display: true, text: `≈ Estimated from ${sample_rows.toLocaleString()} of ${total_rows.toLocaleString()} rows, refining...` };
+            options.plugins.tooltip = {
+                callbacks: {
+                    afterLabel: (context) => {
+                        const interval = (context.dataset.confidence_interval || [])[context.dataIndex];
+                        if (!interval || interval[0] === null) return '';
+                        return `95% CI: ${interval[0].toLocaleString(undefined, { maximumFractionDigits: 2 })} – ${interval[1].toLocaleString(undefined, { maximumFractionDigits: 2 })}`;
+                    }
+                }
+            };
         }
         return { type, options };
     }
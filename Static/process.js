@@ -0,0 +1,228 @@
+document.addEventListener('DOMContentLoaded', () => {
+    const appendForm = document.getElementById('append-form');
+    if (!appendForm) return; // Exit if not on the processing page
+
+    const appendInput = document.getElementById('appendFileInput');
+    const appendMessage = document.getElementById('append-message');
+    const appendBtn = appendForm.querySelector('.submit-btn');
+
+    // Server errors can echo column names from the uploaded file, so messages are set as text, never as HTML
+    function showAppendMessage(kind, text) {
+        const message = document.createElement('div');
+        message.className = `flash-message ${kind}`;
+        message.textContent = text;
+        appendMessage.replaceChildren(message);
+    }
+
+    // Send the new chunk to the append API and reload the page with the updated data
+    appendForm.addEventListener('submit', (e) => {
+        e.preventDefault();
+        const file = appendInput.files[0];
+        if (!file) {
+            alert('Please select a file first.');
+            return;
+        }
+
+        const formData = new FormData();
+        formData.append('file', file);
+
+        appendBtn.textContent = 'Appending...';
+        appendBtn.disabled = true;
+
+        fetch('/api/append-data', {
+            method: 'POST',
+            body: formData
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.error) throw new Error(data.error);
+            showAppendMessage('success', `Appended ${data.rows_appended} rows (${data.duplicates_skipped} duplicates skipped). The dataset now has ${data.total_rows} rows.`);
+            setTimeout(() => window.location.reload(), 1500);
+        })
+        .catch(error => {
+            console.error('Append failed:', error);
+            showAppendMessage('danger', `Append failed: ${error.message}`);
+        })
+        .finally(() => {
+            appendBtn.textContent = 'Append Data';
+            appendBtn.disabled = false;
+        });
+    });
+});
+
+// --- DATA GRID: virtualized table backed by /api/data-grid ---
+document.addEventListener('DOMContentLoaded', () => {
+    const viewport = document.getElementById('grid-viewport');
+    if (!viewport) return; // Exit if the grid is not on this page
+
+    const header = document.getElementById('grid-header');
+    const spacer = document.getElementById('grid-spacer');
+    const rowsContainer = document.getElementById('grid-rows');
+    const status = document.getElementById('grid-status');
+
+    const ROW_HEIGHT = 32;
+    const COLUMN_WIDTH = 160;
+    const PAGE_SIZE = 100;
+    const BUFFER_ROWS = 20;
+    // Browsers cap element heights (about 17.9M px in Firefox), so past this height the
+    // scrollbar position is mapped proportionally onto the rows instead of 1 px per px
+    const MAX_SPACER_HEIGHT = 10000000;
+
+    let columns = [];
+    let columnStats = {};
+    let sort = null;
+    let filters = {};        // column -> {column, op, value}
+    let filteredRows = 0;
+    let pages = new Map();   // page index -> rows
+    let pending = new Set(); // page indexes being fetched
+    let queryId = 0;         // Ignores responses from an older sort/filter
+
+    // First request also returns the column names and the column statistics
+    fetchPage(0, true);
+    viewport.addEventListener('scroll', () => requestAnimationFrame(renderVisibleRows));
+
+    function fetchPage(pageIndex, includeStats = false) {
+        if (pending.has(pageIndex)) return;
+        pending.add(pageIndex);
+        const requestQueryId = queryId;
+
+        fetch('/api/data-grid', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                offset: pageIndex * PAGE_SIZE,
+                limit: PAGE_SIZE,
+                sort: sort,
+                filters: Object.values(filters),
+                include_stats: includeStats
+            })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (requestQueryId !== queryId) return;
+            pending.delete(pageIndex);
+            if (data.error) throw new Error(data.error);
+
+            if (includeStats) {
+                columns = data.columns;
+                columnStats = data.column_stats;
+                buildHeader();
+            }
+            filteredRows = data.filtered_rows;
+            pages.set(pageIndex, data.rows);
+            spacer.style.height = `${Math.min(filteredRows * ROW_HEIGHT, MAX_SPACER_HEIGHT)}px`;
+            status.textContent = `${filteredRows} of ${data.total_rows} rows` + (sort ? ` - sorted by ${sort.column}${sort.descending ? ' (descending)' : ''}` : '');
+            renderVisibleRows();
+        })
+        .catch(error => {
+            pending.delete(pageIndex);
+            console.error('Data grid request failed:', error);
+            status.textContent = `Error: ${error.message}`;
+        });
+    }
+
+    function buildHeader() {
+        const width = `${columns.length * COLUMN_WIDTH}px`;
+        header.style.width = width;
+        spacer.style.width = width;
+        header.innerHTML = '';
+
+        columns.forEach(column => {
+            const cell = document.createElement('div');
+            cell.className = 'grid-header-cell';
+
+            const label = document.createElement('span');
+            label.className = 'grid-sort';
+            label.textContent = column;
+            label.title = describeStats(column, columnStats[column] || {});
+            label.addEventListener('click', () => toggleSort(column));
+
+            const filterInput = document.createElement('input');
+            filterInput.type = 'text';
+            filterInput.placeholder = 'Filter...';
+            filterInput.addEventListener('change', () => setFilter(column, filterInput.value));
+
+            cell.append(label, filterInput);
+            header.appendChild(cell);
+        });
+    }
+
+    function describeStats(column, stats) {
+        const lines = [`${column} (${stats.dtype})`, `Values: ${stats.count}, missing: ${stats.nulls}`];
+        if (stats.min !== undefined) lines.push(`Min: ${stats.min}, max: ${stats.max}`);
+        if (stats.mean !== undefined) lines.push(`Mean: ${stats.mean.toFixed(2)}, std: ${stats.std.toFixed(2)}`);
+        return lines.join('\n');
+    }
+
+    // Scroll offset within the full (unscaled) list of rows
+    function contentScrollTop() {
+        const contentHeight = filteredRows * ROW_HEIGHT;
+        if (contentHeight <= MAX_SPACER_HEIGHT) return viewport.scrollTop;
+        const maxScroll = MAX_SPACER_HEIGHT - viewport.clientHeight;
+        return maxScroll > 0 ? viewport.scrollTop / maxScroll * (contentHeight - viewport.clientHeight) : 0;
+    }
+
+    function renderVisibleRows() {
+        const contentTop = contentScrollTop();
+        const firstRow = Math.max(Math.floor(contentTop / ROW_HEIGHT) - BUFFER_ROWS, 0);
+        const lastRow = Math.min(Math.ceil((contentTop + viewport.clientHeight) / ROW_HEIGHT) + BUFFER_ROWS, filteredRows);
+
+        // Only the rows on screen (plus a small buffer) are in the DOM
+        const html = [];
+        for (let rowIndex = firstRow; rowIndex < lastRow; rowIndex++) {
+            const pageIndex = Math.floor(rowIndex / PAGE_SIZE);
+            const page = pages.get(pageIndex);
+            if (!page) {
+                fetchPage(pageIndex);
+                html.push('<div class="grid-row"><div class="grid-cell">Loading...</div></div>');
+                continue;
+            }
+            const row = page[rowIndex % PAGE_SIZE] || [];
+            const cells = row.map(value => `<div class="grid-cell" title="${escapeHtml(value)}">${escapeHtml(value)}</div>`).join('');
+            html.push(`<div class="grid-row">${cells}</div>`);
+        }
+        // Same as firstRow * ROW_HEIGHT until the spacer height is capped
+        rowsContainer.style.top = `${viewport.scrollTop + firstRow * ROW_HEIGHT - contentTop}px`;
+        rowsContainer.innerHTML = html.join('');
+    }
+
+    function escapeHtml(value) {
+        if (value === null || value === undefined) return '';
+        return String(value).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;');
+    }
+
+    function toggleSort(column) {
+        if (!sort || sort.column !== column) sort = { column, descending: false };
+        else if (!sort.descending) sort.descending = true;
+        else sort = null;
+        resetAndReload();
+    }
+
+    // Turns the text typed in a filter box into a {column, op, value} filter
+    function setFilter(column, text) {
+        text = text.trim();
+        if (!text) {
+            delete filters[column];
+        } else if (text.toLowerCase() === 'null') {
+            filters[column] = { column, op: 'isnull' };
+        } else if (text.toLowerCase() === '!null') {
+            filters[column] = { column, op: 'notnull' };
+        } else {
+            const match = text.match(/^(>=|<=|!=|>|<|=)\s*(.*)$/);
+            const operators = { '>=': 'gte', '<=': 'lte', '!=': 'ne', '>': 'gt', '<': 'lt', '=': 'eq' };
+            filters[column] = match
+                ? { column, op: operators[match[1]], value: match[2] }
+                : { column, op: 'contains', value: text };
+        }
+        resetAndReload();
+    }
+
+    function resetAndReload() {
+        queryId++;
+        pages = new Map();
+        pending = new Set();
+        viewport.scrollTop = 0;
+        status.textContent = 'Loading rows...';
+        fetchPage(0);
+    }
+});
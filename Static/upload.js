@@ -47,6 +47,45 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // Workbooks with several sheets: let the user pick the sheet to import
+    function showSheetPicker(uploadId, sheets) {
+        const responseMessage = document.getElementById('response-message');
+        responseMessage.innerHTML = `
+            <p>This workbook has several sheets. Which one should be imported?</p>
+            <select id="sheet-select"></select>
+            <button type="button" id="sheet-confirm-btn" class="submit-btn">Import Sheet</button>
+        `;
+        // Sheet names come from the uploaded file, so they are set as text, never as HTML
+        const sheetSelect = document.getElementById('sheet-select');
+        sheets.forEach(name => {
+            const option = document.createElement('option');
+            option.value = name;
+            option.textContent = name;
+            sheetSelect.appendChild(option);
+        });
+        submitBtn.textContent = 'Upload & Analyze';
+
+        document.getElementById('sheet-confirm-btn').addEventListener('click', (e) => {
+            e.target.disabled = true;
+            e.target.textContent = 'Importing...';
+            fetch('/upload/select-sheet', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ upload_id: uploadId, sheet_name: document.getElementById('sheet-select').value })
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.redirect) {
+                    window.location.href = data.redirect;
+                } else {
+                    alert(`Upload failed: ${data.error}`);
+                    e.target.disabled = false;
+                    e.target.textContent = 'Import Sheet';
+                }
+            });
+        });
+    }
+
     // Handle the form submission
     uploadForm.addEventListener('submit', (e) => {
         e.preventDefault();
@@ -70,6 +109,8 @@ document.addEventListener('DOMContentLoaded', () => {
         .then(data => {
             if (data.redirect) {
                 window.location.href = data.redirect;
+            } else if (data.sheets) {
+                showSheetPicker(data.upload_id, data.sheets);
             } else if (data.error) {
                 alert(`Upload failed: ${data.error}`);
                 submitBtn.textContent = 'Upload & Analyze';
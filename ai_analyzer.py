@@ -1,40 +1,15 @@
 
-import openai
+import llm_clients
 
-
-api_key = "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"
-
-
-openrouter_base_url = "https://openrouter.ai/api/v1"
-
-# Custom headers required by OpenRouter
-# Replace "INSIGHT_IQ_APP" with your actual app's name or URL
-http_headers = {
-    "HTTP-Referer": "INSIGHT_IQ_APP", 
-    "X-Title": "Insight IQ AI Assistant",
-}
-# --- End of New Configuration ---
-
-# Initialize the client with the OpenRouter settings
-try:
-    if not api_key:
-        client = None
-    else:
-        client = openai.OpenAI(
-            base_url=openrouter_base_url,
-            api_key=api_key,
-            default_headers=http_headers,
-        )
-except TypeError:
-    client = None
+# The OpenRouter client (key from OPENROUTER_API_KEY, custom headers included)
+# is built by llm_clients the first time a chart is analyzed.
 
 
 def get_chart_analysis(image_data_url: str) -> str:
     """
     Analyzes a chart image using an OpenRouter-compatible model.
     """
-    if not client:
-        raise ValueError("OpenRouter API key not configured. Please set the OPENROUTER_API_KEY environment variable.")
+    client = llm_clients.get_client('openrouter')
 
     prompt_text = (
         "You are an expert data analyst. Look at the following chart image. "
@@ -1,121 +1,82 @@
-import os
 import pandas as pd
-from groq import Groq
-from openai import OpenAI  # <-- We already have this, perfect!
-from dotenv import load_dotenv
 from io import StringIO
 import json
 import numpy as np
-import re
 import json
+import threading
+import schema_catalog
+import prompt_context
+import llm_clients
+import dataset_store
+from lru_cache import LRUCache
 
 """
 This is the single, all-in-one module for AI and Chart logic.
 It is designed to be completely self-contained.
-- It communicates with the Groq AI to get chart suggestions.
+- It communicates with the Groq AI to get chart suggestions (clients come from llm_clients).
 - It parses and validates AI responses with a strict firewall.
-- It generates the final data structures required by a front-end (like Chart.js).
+- Chart data itself is built by chart_query, which every chart route shares.
 - It is filled with detailed print statements for easy debugging.
 """
 
-# --- Load Environment Variables & Initialize Client ---
-load_dotenv()
-try:
-    groq_api_key = os.environ.get("GROQ_API_KEY")
-    if not groq_api_key: raise ValueError("CRITICAL: GROQ_API_KEY not found in .env file.")
-    client = Groq(api_key=groq_api_key)
-    print("✅ [ai_chart_generator] Groq client initialized successfully.")
-except Exception as e:
-    print(f"!!! [ai_chart_generator] Failed to initialize Groq client: {e}"); client = None
-try:
-    openrouter_api_key = os.environ.get("OPENROUTER_API_KEY")
-    if not openrouter_api_key: raise ValueError("CRITICAL: OPENROUTER_API_KEY not found in .env file.")
-    
-    openrouter_client = OpenAI(
-      base_url="https://openrouter.ai/api/v1",
-      api_key=openrouter_api_key,
-    )
-    # Optional headers for OpenRouter analytics
-    openrouter_headers = {
-        "HTTP-Referer": os.environ.get("YOUR_SITE_URL", ""),
-        "X-Title": os.environ.get("YOUR_SITE_NAME", ""),
-    }
-    print("✅ [ai_chart_generator] OpenRouter client initialized.")
-except Exception as e:
-    print(f"!!! [ai_chart_generator] Failed to initialize OpenRouter client: {e}"); openrouter_client = None
-
 # ==============================================================================
 # --- CORE LOGIC - This is the heart of the module ---
 # ==============================================================================
 
-def _normalize_name(name):
-    """A consistent normalization function used everywhere to clean column names."""
-    return re.sub(r'[^a-z0-9]', '', str(name).lower())
+_normalize_name = schema_catalog.normalize_name
+
+# Dashboard suggestions only depend on the data, so they are kept per dataset version
+MAX_CACHED_DASHBOARDS = 16
+_dashboard_cache = LRUCache(MAX_CACHED_DASHBOARDS)  # (dataset_id, version) -> list of chart configs
+_dashboard_lock = threading.Lock()  # Guards _dashboard_key_locks
+_dashboard_key_locks = {}           # (dataset_id, version) -> lock held while the AI is asked
 
-def generate_chart_data(df, options):
+def get_dashboard_configs_from_data(catalog):
     """
-    Takes a DataFrame and chart options, then returns data formatted for Chart.js.
-    This is the final step and handles all data type combinations.
+    Returns the AI dashboard suggestions for a dataset version.
+    The AI is asked at most once per version: a second caller (e.g. the page and a
+    speculative precompute) waits for the first answer instead of asking again.
     """
-    print("\n" + "-"*80)
-    print("--- STEP 5 [ai_chart_generator]: Generating Final Chart Data ---")
-    print(f"--- Received options: {options}")
+    key = (catalog.get('dataset_id'), catalog.get('version'))
+    if key[0] is None:
+        return _ask_dashboard_configs(catalog)
+    with _dashboard_lock:
+        key_lock = _dashboard_key_locks.setdefault(key, threading.Lock())
+    cached = False
     try:
-        chart_type, x_sugg, y_sugg = options.get('chartType'), options.get('x_column'), options.get('y_column')
-        actual_cols = df.columns.tolist()
-        
-        # Use normalization to find the correct column names
-        normalized_mapping = {_normalize_name(col): col for col in actual_cols}
-        x_col = normalized_mapping.get(_normalize_name(x_sugg))
-        y_col = normalized_mapping.get(_normalize_name(y_sugg))
-
-        print(f"  - Normalizing X: '{x_sugg}' -> Resolved to: '{x_col}'")
-        print(f"  - Normalizing Y: '{y_sugg}' -> Resolved to: '{y_col}'")
-        
-        if not all([chart_type, x_col, y_col]):
-            error_msg = f"A required column ('{x_sugg}' or '{y_sugg}') could not be found."
-            print(f"  - ❌ FAILED: {error_msg}")
-            return {'error': error_msg}
-            
-        is_x_numeric, is_y_numeric = pd.api.types.is_numeric_dtype(df[x_col]), pd.api.types.is_numeric_dtype(df[y_col])
-        chart_data = {}
-
-        if chart_type in ['pie', 'doughnut']:
-            if not is_y_numeric: return {'error': f"Pie charts require a numeric Y-axis ('{y_col}')."}
-            grouped = df.groupby(x_col)[y_col].sum().nlargest(10)
-            chart_data['labels'], chart_data['datasets'] = grouped.index.astype(str).tolist(), [{'label': y_col, 'data': grouped.values.tolist()}]
-        elif chart_type == 'bar':
-            if not is_y_numeric: return {'error': f"Bar charts require a numeric Y-axis ('{y_col}')."}
-            if not is_x_numeric: grouped = df.groupby(x_col)[y_col].sum().nlargest(25).sort_index()
-            else:
-                df['x_binned'] = pd.cut(df[x_col], bins=10); grouped = df.groupby('x_binned')[y_col].sum()
-            chart_data['labels'], chart_data['datasets'] = grouped.index.astype(str).tolist(), [{'label': y_col, 'data': grouped.values.tolist()}]
-        elif chart_type == 'line':
-            if not is_y_numeric: return {'error': f"Line charts require a numeric Y-axis ('{y_col}')."}
-            df_sorted = df.sort_values(by=x_col).dropna(subset=[x_col, y_col])
-            chart_data['labels'] = df_sorted[x_col].tolist()
-            chart_data['datasets'] = [{'label': y_col, 'data': df_sorted[y_col].tolist(), 'fill': False, 'tension': 0.1}]
-        elif chart_type == 'scatter':
-            df_sorted = df.dropna(subset=[x_col, y_col])
-            chart_data['datasets'] = [{'label': f'{y_col} vs {x_col}', 'data': [{'x': r[x_col], 'y': r[y_col]} for _, r in df_sorted.iterrows()]}]
-        else: return {'error': f"Unsupported chart type: {chart_type}"}
-        
-        print("  - ✅ SUCCESS: Chart data generated.")
-        print("-" * 80 + "\n")
-        return chart_data
-    except Exception as e:
-        print(f"  - ❌ FATAL ERROR in generate_chart_data: {e}")
-        return {'error': f'An internal error occurred: {str(e)}'}
-
-def get_dashboard_configs_from_data(df):
-    """The main AI function to generate a dashboard, with extreme debugging."""
-    if client is None: raise ConnectionError("Groq client not initialized.")
-    actual_columns = df.columns.tolist()
-    column_names_str = ", ".join(f"'{c}'" for c in actual_columns)
-    prompt = f"Analyze data with columns {column_names_str}. Suggest charts in a markdown table ('Column X', 'Column Y', 'Chart Type'). Types: 'bar', 'line', 'scatter', 'pie'. Use ONLY given columns. Provide ONLY the table. Data sample:\n{df.head().to_string()}"
+        with key_lock:
+            configs = _dashboard_cache.get(key)
+            if configs is not None:
+                cached = True
+                print(f"✅ [ai_chart_generator] Dashboard suggestions for {key[0]} v{key[1]} served from cache.")
+                return configs
+            # Answers are also saved with the dataset, so they survive restarts and re-uploads of the same file
+            configs = dataset_store.load_artifact(key[0], key[1], 'dashboard_configs')
+            if configs is None:
+                configs = _ask_dashboard_configs(catalog)
+                if configs:
+                    dataset_store.save_artifact(key[0], key[1], 'dashboard_configs', configs)
+            if configs:
+                cached = True
+                with _dashboard_lock:
+                    for old_key in _dashboard_cache.put(key, configs):
+                        _dashboard_key_locks.pop(old_key, None)
+            return configs
+    finally:
+        # A failed or empty answer caches nothing, so its lock would otherwise never be removed
+        if not cached:
+            with _dashboard_lock:
+                if _dashboard_key_locks.get(key) is key_lock:
+                    del _dashboard_key_locks[key]
+
+def _ask_dashboard_configs(catalog):
+    """The main AI function to generate a dashboard, with extreme debugging. Describes the data with a token-budgeted schema context."""
+    client = llm_clients.get_client('groq')
+    context = prompt_context.build_prompt_context(catalog)
+    prompt = f"Analyze this data.\n{context}\nSuggest charts in a markdown table ('Column X', 'Column Y', 'Chart Type'). Types: 'bar', 'line', 'scatter', 'pie'. Use ONLY given columns. Provide ONLY the table."
 
     print("\n" + "#"*80); print("### STEP 1 [ai_chart_generator]: SENDING PROMPT TO GROQ AI ###")
-    print(f"Prompt is using these available columns: {actual_columns}"); print("#"*80 + "\n")
+    print(f"Prompt context (~{prompt_context.estimate_tokens(prompt)} tokens):\n{context}"); print("#"*80 + "\n")
     
     try:
         completion = client.chat.completions.create(model="llama-3.1-8b-instant", messages=[{"role": "user", "content": prompt}], temperature=0.1, max_tokens=2048)
@@ -128,14 +89,13 @@ def get_dashboard_configs_from_data(df):
         if suggestions_df.empty: return []
 
         valid_configs = []; print("\n" + "#"*80); print("### STEP 3 [ai_chart_generator]: VALIDATION FIREWALL - CHECKING EACH SUGGESTION ###")
-        normalized_mapping = {_normalize_name(col): col for col in actual_columns}
-        print(f"Firewall is checking against this normalized mapping: {normalized_mapping}")
+        print(f"Firewall is checking against this normalized mapping: {catalog['normalized']}")
 
         for index, row in suggestions_df.iterrows():
             x_sugg, y_sugg = row['x_column'].strip(), row['y_column'].strip()
             print(f"\n--- Evaluating Suggestion #{index+1}: X='{x_sugg}', Y='{y_sugg}' ---")
             norm_x, norm_y = _normalize_name(x_sugg), _normalize_name(y_sugg)
-            x_corrected, y_corrected = normalized_mapping.get(norm_x), normalized_mapping.get(norm_y)
+            x_corrected, y_corrected = schema_catalog.resolve_column(catalog, x_sugg), schema_catalog.resolve_column(catalog, y_sugg)
             print(f"  - Normalized AI suggestion: X='{norm_x}', Y='{norm_y}'")
             print(f"  - Matched actual columns: X='{x_corrected}', Y='{y_corrected}'")
             if x_corrected and y_corrected:
@@ -153,10 +113,10 @@ def get_dashboard_configs_from_data(df):
     except Exception as e:
         print(f"!!! CRITICAL ERROR in get_dashboard_configs_from_data: {e}"); raise
 
-def get_chart_config_from_prompt(user_prompt, df):
-    """Generates a single chart config from a text prompt."""
-    if client is None: raise ConnectionError("Groq client not initialized.")
-    cols = ", ".join(f"'{c}'" for c in df.columns); prompt = f"Generate JSON for user request '{user_prompt}' using columns from {cols}. RULES: Respond with single JSON: {{\"chartType\": \"bar|line|scatter|pie\", \"x_column\": \"<col>\", \"y_column\": \"<col>\", \"title\": \"<title>\"}}. Use ONLY given columns."
+def get_chart_config_from_prompt(user_prompt, catalog):
+    """Generates a single chart config from a text prompt, describing the columns most relevant to the request."""
+    client = llm_clients.get_client('groq')
+    context = prompt_context.build_prompt_context(catalog, user_prompt); prompt = f"Generate JSON for user request '{user_prompt}' using these columns.\n{context}\nRULES: Respond with single JSON: {{\"chartType\": \"bar|line|scatter|pie\", \"x_column\": \"<col>\", \"y_column\": \"<col>\", \"title\": \"<title>\"}}. Use ONLY given columns."
     try:
         completion = client.chat.completions.create(model="llama-3.1-8b-instant", messages=[{"role": "user", "content": prompt}], temperature=0.0, max_tokens=1024, response_format={"type": "json_object"})
         config = json.loads(completion.choices[0].message.content)
@@ -181,8 +141,7 @@ def get_insight_from_image_openrouter(base64_image_data_url):
     Takes a base64 encoded chart image and asks Gemini 2.0 Flash via OpenRouter
     for a detailed, multi-line interpretation.
     """
-    if openrouter_client is None:
-        raise ConnectionError("OpenRouter client not initialized. Check your API key.")
+    openrouter_client = llm_clients.get_client('openrouter')
 
     # --- THIS IS THE UPDATED PROMPT ---
     prompt_text = """
@@ -207,7 +166,6 @@ def get_insight_from_image_openrouter(base64_image_data_url):
 
     try:
         completion = openrouter_client.chat.completions.create(
-          extra_headers=openrouter_headers,
           model="google/gemini-2.0-flash-exp:free",
           messages=[
             {
@@ -0,0 +1,441 @@
+import os
+import json
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import schema_catalog
+import histograms
+from lru_cache import LRUCache
+
+"""
+One chart query engine for every chart in the app.
+A chart is described by a declarative spec:
+    {
+        'chartType': 'bar' | 'line' | 'pie' | 'doughnut' | 'scatter' | 'histogram',
+        'x': <column to group by / bin / plot on the x axis>,
+        'measures': [{'column': <col>, 'agg': 'sum' | 'mean' | ..., 'label': <optional>}, ...],
+        'filters': [{'column': <col>, 'op': 'eq' | 'gt' | 'contains' | ..., 'value': <value>}],
+        'sort': {'by': 'value' | 'x', 'descending': bool},
+        'limit': <max number of groups>,
+        'bins': <number of bins for a numeric x>,
+        'bin_scale': 'linear' | 'log' | 'quantile',   (histograms only)
+        'granularity': 'auto' | 'minute' | 'hour' | 'day' | 'week' | 'month',
+        'max_points': <point budget used by 'auto'>,
+        'approximate': bool,   (answer from the dataset's random sample, see run_query)
+    }
+The spec is compiled into a single vectorized pass: one filter mask and one
+groupby with all measures, no matter how many series the chart has.
+A datetime x on a line/area chart is bucketed into calendar periods, so a year of
+minute-level data becomes a few hundred points instead of half a million.
+Histograms of stored columns are derived from precomputed base histograms (see histograms.py).
+Results are cached per (dataset version, spec).
+The caller's DataFrame is never modified.
+"""
+
+CHART_TYPES = {'bar', 'horizontalBar', 'line', 'area', 'pie', 'doughnut', 'scatter', 'histogram'}
+AGGREGATIONS = {'sum', 'mean', 'median', 'min', 'max', 'count', 'nunique'}
+COUNT_AGGREGATIONS = {'count', 'nunique'}  # These also work on non-numeric columns
+FILTER_OPERATORS = {'eq', 'ne', 'gt', 'gte', 'lt', 'lte', 'contains', 'in', 'isnull', 'notnull'}
+
+DEFAULT_BINS = 10
+# Per chart type: default sort, limit, whether a numeric x gets binned and whether a datetime x gets bucketed
+CHART_DEFAULTS = {
+    'bar': {'sort': {'by': 'value', 'descending': True}, 'limit': 25, 'bin_numeric_x': True, 'bucket_time_x': False},
+    'horizontalBar': {'sort': {'by': 'value', 'descending': True}, 'limit': 25, 'bin_numeric_x': True, 'bucket_time_x': False},
+    'line': {'sort': {'by': 'x', 'descending': False}, 'limit': None, 'bin_numeric_x': False, 'bucket_time_x': True},
+    'area': {'sort': {'by': 'x', 'descending': False}, 'limit': None, 'bin_numeric_x': False, 'bucket_time_x': True},
+    'pie': {'sort': {'by': 'value', 'descending': True}, 'limit': 10, 'bin_numeric_x': False, 'bucket_time_x': False},
+    'doughnut': {'sort': {'by': 'value', 'descending': True}, 'limit': 10, 'bin_numeric_x': False, 'bucket_time_x': False},
+}
+
+# Max number of points 'auto' granularity aims for (can be set with the CHART_POINT_BUDGET env variable)
+POINT_BUDGET = int(os.environ.get('CHART_POINT_BUDGET', 500))
+# Calendar buckets from finest to coarsest: (approximate bucket length, label format)
+TIME_GRANULARITIES = OrderedDict([
+    ('minute', (pd.Timedelta(minutes=1), '%Y-%m-%d %H:%M')),
+    ('hour', (pd.Timedelta(hours=1), '%Y-%m-%d %H:00')),
+    ('day', (pd.Timedelta(days=1), '%Y-%m-%d')),
+    ('week', (pd.Timedelta(weeks=1), '%Y-%m-%d')),
+    ('month', (pd.Timedelta(days=30), '%Y-%m')),
+])
+
+# Approximate answers: sums and counts are scaled up from the sample, with 95% confidence intervals
+CONFIDENCE_Z = 1.96
+SCALED_AGGREGATIONS = {'sum', 'count'}
+
+MAX_CACHED_RESULTS = 64
+_result_cache = LRUCache(MAX_CACHED_RESULTS)  # (dataset_id, version, spec json) -> chart data
+
+
+# ==============================================================================
+# --- Filters (shared with the data grid) ---
+# ==============================================================================
+
+def _coerce_value(series, value):
+    """Converts a filter value coming from JSON to something comparable with the column."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return pd.Timestamp(value)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return float(value)
+    return value
+
+
+def build_filter_mask(df, filters):
+    """Builds one boolean mask for all filters (they are combined with AND). Raises ValueError on bad filters."""
+    mask = np.ones(len(df), dtype=bool)
+    for f in filters:
+        column, op, value = f.get('column'), f.get('op', 'eq'), f.get('value')
+        if column not in df.columns:
+            raise ValueError(f"Unknown filter column '{column}'.")
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"Unknown filter operator '{op}'.")
+        series = df[column]
+
+        if op == 'isnull':
+            cond = series.isna()
+        elif op == 'notnull':
+            cond = series.notna()
+        elif op == 'contains':
+            cond = series.astype(str).str.contains(str(value), case=False, regex=False, na=False)
+        elif op == 'in':
+            values = value if isinstance(value, list) else [value]
+            cond = series.isin([_coerce_value(series, v) for v in values])
+        else:
+            try:
+                value = _coerce_value(series, value)
+            except (ValueError, TypeError):
+                raise ValueError(f"Filter value '{value}' does not match the type of column '{column}'.")
+            if series.dtype == 'object' and op in ('gt', 'gte', 'lt', 'lte'):
+                series = series.astype(str)
+                value = str(value)
+            cond = {
+                'eq': lambda: series == value, 'ne': lambda: series != value,
+                'gt': lambda: series > value, 'gte': lambda: series >= value,
+                'lt': lambda: series < value, 'lte': lambda: series <= value,
+            }[op]()
+        mask &= cond.to_numpy(dtype=bool, na_value=False)
+    return mask
+
+
+# ==============================================================================
+# --- Spec handling ---
+# ==============================================================================
+
+def spec_from_options(options):
+    """
+    Translates the payloads sent by the dashboard builder (x_axis, y_axis, category, values, column)
+    and by the AI pages (x_column, y_column) into a query spec. Keys that are already part of the
+    declarative spec (x, measures, filters, sort, limit, bins) are passed through.
+    """
+    chart_type = options.get('chartType')
+    x = options.get('x') or options.get('x_axis') or options.get('category') or options.get('column') or options.get('x_column')
+
+    measures = options.get('measures')
+    if not measures:
+        y = options.get('y_axis') or options.get('values') or options.get('y_column')
+        y_columns = y if isinstance(y, list) else ([y] if y else [])
+        agg = options.get('agg_func') or ('count' if chart_type == 'histogram' else 'sum')
+        measures = [{'column': col, 'agg': agg} for col in y_columns]
+
+    return {
+        'chartType': chart_type,
+        'x': x,
+        'measures': measures,
+        'filters': options.get('filters') or [],
+        'sort': options.get('sort'),
+        'limit': options.get('limit'),
+        'bins': options.get('bins'),
+        'bin_scale': options.get('bin_scale'),
+        'granularity': options.get('granularity'),
+        'max_points': options.get('max_points'),
+        'approximate': bool(options.get('approximate')),
+    }
+
+
+def _parse_bins(value, default=DEFAULT_BINS):
+    try:
+        return max(int(value), 1)
+    except (ValueError, TypeError):
+        return default
+
+
+def _to_float_list(values):
+    """Float list for JSON, with NaN turned into None."""
+    return [None if pd.isna(v) else float(v) for v in values]
+
+
+def _resolve_measures(spec, catalog):
+    measures = []
+    for measure in spec.get('measures') or []:
+        column = schema_catalog.resolve_column(catalog, measure.get('column'))
+        agg = (measure.get('agg') or 'sum').lower()
+        if column is None:
+            raise ValueError(f"A required column ('{measure.get('column')}') could not be found.")
+        if agg not in AGGREGATIONS:
+            raise ValueError(f"Unsupported aggregation '{agg}'. Use one of: {', '.join(sorted(AGGREGATIONS))}.")
+        if agg not in COUNT_AGGREGATIONS and not schema_catalog.is_numeric(catalog, column):
+            raise ValueError(f"Column '{column}' must be numeric for '{agg}' aggregation.")
+        label = measure.get('label') or (column if agg == 'sum' else f"{agg.capitalize()} of {column}")
+        measures.append({'column': column, 'agg': agg, 'label': label})
+    return measures
+
+
+# ==============================================================================
+# --- Time bucketing ---
+# ==============================================================================
+
+def choose_granularity(start, end, max_points=POINT_BUDGET):
+    """The finest calendar bucket that keeps the number of points within max_points."""
+    if pd.isna(start) or pd.isna(end):
+        return 'day'
+    span = end - start
+    for name, (length, _) in TIME_GRANULARITIES.items():
+        if span // length + 1 <= max_points:
+            return name
+    return 'month'
+
+
+def _time_buckets(series, granularity):
+    """Vectorized: maps every timestamp to the start of its bucket."""
+    if granularity == 'week':
+        return series.dt.to_period('W').dt.start_time
+    if granularity == 'month':
+        return series.dt.to_period('M').dt.start_time
+    return series.dt.floor({'minute': 'min', 'hour': 'h', 'day': 'D'}[granularity])
+
+
+def _bucket_time_x(view, x_col, spec):
+    """Returns (bucket keys, granularity) for a datetime x column."""
+    series = view[x_col]
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        series = pd.to_datetime(series, errors='coerce')
+    if getattr(series.dt, 'tz', None) is not None:
+        series = series.dt.tz_localize(None)
+
+    granularity = (spec.get('granularity') or 'auto').lower()
+    if granularity == 'auto':
+        try:
+            max_points = max(int(spec.get('max_points') or POINT_BUDGET), 1)
+        except (ValueError, TypeError):
+            max_points = POINT_BUDGET
+        granularity = choose_granularity(series.min(), series.max(), max_points)
+    elif granularity not in TIME_GRANULARITIES:
+        raise ValueError(f"Unsupported granularity '{granularity}'. Use auto or one of: {', '.join(TIME_GRANULARITIES)}.")
+    return _time_buckets(series, granularity).rename(x_col), granularity
+
+
+# ==============================================================================
+# --- Approximate answers from a sample ---
+# ==============================================================================
+
+def _sample_stat_columns(view, measures):
+    """Extra columns and per-group aggregations needed for the error bounds."""
+    columns, aggs = {}, {}
+    for i, measure in enumerate(measures):
+        if measure['agg'] == 'sum':
+            columns[f'_sq{i}'] = view[measure['column']].astype('float64') ** 2
+            aggs[f'sq{i}'] = (f'_sq{i}', 'sum')
+        elif measure['agg'] == 'mean':
+            aggs[f'sd{i}'] = (measure['column'], 'std')
+            aggs[f'n{i}'] = (measure['column'], 'count')
+    return columns, aggs
+
+
+def _scale_estimates(grouped, measures, sample_rows, population_rows):
+    """
+    Turns per-group sample aggregates into estimates for the full dataset, with a
+    confidence interval (lo{i}, hi{i}) for sums, counts and means.
+    Median, min, max and nunique are returned as measured on the sample, without bounds.
+    """
+    n, total = sample_rows, population_rows
+    fpc = max(1 - n / total, 0.0)  # Finite population correction
+    for i, measure in enumerate(measures):
+        value = grouped[f'm{i}'].astype('float64')
+        if measure['agg'] in SCALED_AGGREGATIONS:
+            # Sum of y over a group = total * mean of z, with z = y inside the group and 0 outside it
+            sum_sq = grouped[f'sq{i}'] if measure['agg'] == 'sum' else value
+            var_z = ((sum_sq - value ** 2 / n) / max(n - 1, 1)).clip(lower=0)
+            error = total * np.sqrt(fpc * var_z / n)
+            value = value * total / n
+        elif measure['agg'] == 'mean':
+            error = grouped[f'sd{i}'] / np.sqrt(grouped[f'n{i}']) * np.sqrt(fpc)
+        else:
+            error = pd.Series(np.nan, index=grouped.index)
+        grouped[f'm{i}'] = value
+        grouped[f'lo{i}'] = value - CONFIDENCE_Z * error
+        grouped[f'hi{i}'] = value + CONFIDENCE_Z * error
+    return grouped
+
+
+def _scale_histogram(result, sample_rows, population_rows):
+    """Scales histogram counts from the sample to the full dataset and adds their bounds."""
+    n, total = sample_rows, population_rows
+    fpc = max(1 - n / total, 0.0)
+    for dataset in result.get('datasets', []):
+        counts = np.array(dataset['data'], dtype='float64')
+        share = counts / n
+        error = total * np.sqrt(fpc * share * (1 - share) / max(n - 1, 1))
+        dataset['data'] = _to_float_list(share * total)
+        dataset['confidence_interval'] = [[lo, hi] for lo, hi in zip(_to_float_list(share * total - CONFIDENCE_Z * error), _to_float_list(share * total + CONFIDENCE_Z * error))]
+    return result
+
+
+# ==============================================================================
+# --- Chart builders ---
+# ==============================================================================
+
+def _histogram(series, spec):
+    """Histogram of rows that have no precomputed histogram (e.g. filtered rows)."""
+    return histograms.render(histograms.build_pyramid(series), _parse_bins(spec.get('bins')), spec.get('bin_scale') or 'linear', series.name)
+
+
+def _precomputed_histogram(spec, catalog):
+    """Unfiltered histograms of a stored dataset never need to touch the rows."""
+    if spec.get('chartType') != 'histogram' or spec.get('filters') or catalog.get('dataset_id') is None:
+        return None
+    x_col = schema_catalog.resolve_column(catalog, spec.get('x'))
+    if x_col is None or not schema_catalog.is_numeric(catalog, x_col):
+        return None  # run_query reports the error
+    try:
+        return histograms.get_histogram(catalog['dataset_id'], x_col, _parse_bins(spec.get('bins')), spec.get('bin_scale') or 'linear')
+    except ValueError as e:
+        return {'error': str(e)}
+
+
+def _scatter(view, x_col, measures, limit):
+    datasets = []
+    for measure in measures:
+        points = view[[x_col, measure['column']]].dropna()
+        if limit:
+            points = points.head(limit)
+        xs, ys = points[x_col].to_numpy(dtype=float).tolist(), points[measure['column']].to_numpy(dtype=float).tolist()
+        datasets.append({'label': f"{measure['column']} vs {x_col}", 'data': [{'x': x, 'y': y} for x, y in zip(xs, ys)]})
+    return {'datasets': datasets}
+
+
+def _grouped(view, x_col, measures, spec, chart_type, catalog, sample=None):
+    defaults = CHART_DEFAULTS[chart_type]
+    key = view[x_col]
+    binned = False
+    granularity = None
+    if schema_catalog.is_numeric(catalog, x_col) and (spec.get('bins') or defaults['bin_numeric_x']):
+        key = pd.cut(key, bins=_parse_bins(spec.get('bins')))
+        binned = True
+    elif catalog['by_name'][x_col]['kind'] == 'datetime' and (defaults['bucket_time_x'] or spec.get('granularity')):
+        key, granularity = _bucket_time_x(view, x_col, spec)
+
+    # All measures in ONE groupby: a five-series chart costs the same pass as a single series
+    named_aggs = {f'm{i}': (m['column'], m['agg']) for i, m in enumerate(measures)}
+    if sample:
+        stat_columns, stat_aggs = _sample_stat_columns(view, measures)
+        view, named_aggs = view.assign(**stat_columns), {**named_aggs, **stat_aggs}
+    grouped = view.groupby(key, observed=not binned, sort=True).agg(**named_aggs)
+    if sample:
+        grouped = _scale_estimates(grouped, measures, *sample)
+
+    sort = spec.get('sort') or defaults['sort']
+    if binned and not spec.get('sort'):
+        sort = {'by': 'x', 'descending': False}  # Bins read best in their natural order
+    if sort.get('by', 'value') == 'x':
+        grouped = grouped.sort_index(ascending=not sort.get('descending', False))
+    else:
+        grouped = grouped.sort_values(by='m0', ascending=not sort.get('descending', True))
+
+    limit = spec.get('limit') if spec.get('limit') is not None else defaults['limit']
+    if limit:
+        grouped = grouped.head(int(limit))
+
+    datasets = []
+    for i, measure in enumerate(measures):
+        dataset = {'label': measure['label'], 'data': _to_float_list(grouped[f'm{i}'])}
+        if sample:
+            dataset['confidence_interval'] = [list(pair) for pair in zip(_to_float_list(grouped[f'lo{i}']), _to_float_list(grouped[f'hi{i}']))]
+        if chart_type in ('line', 'area'):
+            dataset.update({'fill': chart_type == 'area', 'tension': 0.1})
+        datasets.append(dataset)
+
+    if granularity:
+        labels = grouped.index.strftime(TIME_GRANULARITIES[granularity][1]).tolist()
+        return {'labels': labels, 'datasets': datasets, 'granularity': granularity}
+    return {'labels': grouped.index.astype(str).tolist(), 'datasets': datasets}
+
+
+def _cache_key(spec, catalog):
+    if not catalog or catalog.get('dataset_id') is None:
+        return None
+    return (catalog['dataset_id'], catalog['version'], json.dumps(spec, sort_keys=True, default=str))
+
+
+def get_cached_result(spec, catalog):
+    """
+    Returns the chart data computed earlier for this spec and dataset version
+    (or derived from the precomputed histograms), or None if the rows are needed.
+    """
+    key = _cache_key(spec, catalog)
+    if key is None:
+        return None
+    cached = _result_cache.get(key)
+    if cached is not None:
+        return cached
+    return _precomputed_histogram(spec, catalog)
+
+
+def run_query(df, spec, catalog=None, population_rows=None):
+    """
+    Runs a chart query spec against a DataFrame and returns Chart.js data
+    ({'labels': [...], 'datasets': [...]}) or {'error': <message>}.
+    When the catalog belongs to a stored dataset the result is cached for that version.
+    If df is a uniform random sample of a dataset with population_rows rows, the
+    answer is estimated: sums and counts are scaled up, every dataset gets a
+    'confidence_interval' list and the result is marked with 'approximate'.
+    """
+    cached = get_cached_result(spec, catalog)
+    if cached is not None:
+        return cached
+    sample = (len(df), population_rows) if population_rows and 0 < len(df) < population_rows else None
+    result = _run_query(df, spec, catalog, sample)
+    if sample and 'error' not in result:
+        result['approximate'] = {'sample_rows': sample[0], 'total_rows': sample[1], 'confidence': 0.95}
+    key = _cache_key(spec, catalog)
+    if key is not None and 'error' not in result:
+        _result_cache.put(key, result)
+    return result
+
+
+def _run_query(df, spec, catalog=None, sample=None):
+    try:
+        if catalog is None: catalog = schema_catalog.build_catalog(df)
+        chart_type = spec.get('chartType')
+        if chart_type not in CHART_TYPES:
+            return {'error': f"Unsupported chart type: {chart_type}"}
+
+        x_col = schema_catalog.resolve_column(catalog, spec.get('x'))
+        if x_col is None:
+            return {'error': f"A required column ('{spec.get('x')}') could not be found."}
+
+        if chart_type == 'histogram':
+            if not schema_catalog.is_numeric(catalog, x_col):
+                return {'error': f'Column "{x_col}" must be numeric for a histogram.'}
+            measures = []
+        else:
+            measures = _resolve_measures(spec, catalog)
+            if not measures:
+                return {'error': 'At least one value column is required.'}
+            if chart_type == 'scatter' and not all(schema_catalog.is_numeric(catalog, c) for c in [x_col] + [m['column'] for m in measures]):
+                return {'error': 'Both axes must be numeric for a scatter plot.'}
+
+        # Select only the needed columns (and rows, if filtered); df itself is left untouched
+        needed = list(dict.fromkeys([x_col] + [m['column'] for m in measures]))
+        filters = spec.get('filters') or []
+        view = df.loc[build_filter_mask(df, filters), needed] if filters else df[needed]
+
+        if chart_type == 'histogram':
+            result = _histogram(view[x_col], spec)
+            return _scale_histogram(result, *sample) if sample else result
+        if chart_type == 'scatter':
+            return _scatter(view, x_col, measures, spec.get('limit'))  # A sample of the points is already a fair picture
+        return _grouped(view, x_col, measures, spec, chart_type, catalog, sample)
+    except ValueError as e:
+        return {'error': str(e)}
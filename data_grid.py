@@ -0,0 +1,109 @@
+import json
+
+import numpy as np
+
+import dataset_store
+from lru_cache import LRUCache
+from chart_query import build_filter_mask
+
+"""
+Server-side paging, sorting and filtering for the data grid on the processing page.
+- Sort orders are computed once per (dataset version, column, direction) and cached.
+- Filter results are cached per (dataset version, filter list).
+- Only the rows of the requested page are ever serialized.
+"""
+
+MAX_PAGE_SIZE = 500
+MAX_CACHED_ORDERS = 32
+
+_order_cache = LRUCache(MAX_CACHED_ORDERS)  # (dataset_id, version, kind, key) -> sort order or filter mask
+
+
+def _cached(key, compute):
+    return _order_cache.get_or_compute(key, compute)
+
+
+def _sort_positions(series, descending=False):
+    """Row positions in sorted order, with missing values always last."""
+    is_null = series.isna().to_numpy()
+    valid = np.flatnonzero(~is_null)
+    values = series.to_numpy()[valid]
+    if series.dtype == 'object':
+        values = values.astype(str)
+    order = valid[np.argsort(values, kind='stable')]
+    if descending:
+        order = order[::-1]
+    return np.concatenate([order, np.flatnonzero(is_null)])
+
+
+def _column_stats(dataset_id, df):
+    """Per-column statistics for the grid header, mostly taken from the stored profile."""
+    profile = dataset_store.get_profile(dataset_id)
+    stats = {}
+    for col in df.columns:
+        col_stats = {'dtype': str(df[col].dtype), **profile.get(col, {})}
+        col_stats.pop('sum_sq', None)
+        stats[col] = col_stats
+    return stats
+
+
+def _non_negative_int(value, name):
+    """Parses a paging parameter; raises ValueError for null, non-integer or negative values."""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"'{name}' must be a non-negative integer.")
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be a non-negative integer.")
+    if number < 0:
+        raise ValueError(f"'{name}' must be a non-negative integer.")
+    return number
+
+
+def get_page(dataset_id, offset=0, limit=100, sort=None, filters=None, include_stats=False):
+    """
+    Returns one page of rows after applying the filters and the sort order.
+    offset and limit must be non-negative integers (limit is capped at MAX_PAGE_SIZE).
+    sort: {'column': <name>, 'descending': bool} or None.
+    filters: list of {'column': <name>, 'op': <operator>, 'value': <value>}.
+    """
+    offset = _non_negative_int(offset, 'offset')
+    limit = min(max(_non_negative_int(limit, 'limit'), 1), MAX_PAGE_SIZE)
+    version = dataset_store.get_version(dataset_id)
+    df = dataset_store.load_dataset(dataset_id, copy=False)
+    filters = filters or []
+
+    # 1. Row positions in the requested order (cached per column)
+    positions = None
+    if sort and sort.get('column'):
+        column = sort['column']
+        if column not in df.columns:
+            raise ValueError(f"Unknown sort column '{column}'.")
+        descending = bool(sort.get('descending'))
+        positions = _cached((dataset_id, version, 'sort', (column, descending)), lambda: _sort_positions(df[column], descending))
+
+    # 2. Apply the filters (the mask is cached per filter list)
+    if filters:
+        filter_key = json.dumps(filters, sort_keys=True, default=str)
+        mask = _cached((dataset_id, version, 'filter', filter_key), lambda: build_filter_mask(df, filters))
+        positions = np.flatnonzero(mask) if positions is None else positions[mask[positions]]
+
+    total_matches = len(df) if positions is None else len(positions)
+
+    # 3. Serialize only the requested page
+    page_positions = np.arange(offset, min(offset + limit, total_matches)) if positions is None else positions[offset:offset + limit]
+    page = df.iloc[page_positions]
+    page_json = json.loads(page.to_json(orient='split', date_format='iso', index=False, default_handler=str))
+
+    result = {
+        'columns': page_json['columns'],
+        'rows': page_json['data'],
+        'row_positions': page_positions.tolist(),
+        'offset': offset,
+        'limit': limit,
+        'total_rows': int(len(df)),
+        'filtered_rows': int(total_matches),
+    }
+    if include_stats:
+        result['column_stats'] = _column_stats(dataset_id, df)
+    return result
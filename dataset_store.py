@@ -0,0 +1,491 @@
+import os
+import json
+import uuid
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from lru_cache import LRUCache
+
+"""
+Internal storage for uploaded datasets.
+- Every dataset lives in its own folder as a list of row "parts" (pickled DataFrames).
+- Appending new data only writes new parts, it never rewrites the existing ones.
+- Column profiles (counts, sums, min/max) and row hashes used for de-duplication
+  are kept next to the parts and updated from the new rows only.
+- A uniform random sample (reservoir) of at most SAMPLE_ROWS rows is kept next to
+  the parts for approximate queries, and also updated from the new rows only.
+- Loaded frames are cached in memory per dataset version.
+- Small results computed from a dataset version (e.g. AI suggestions) can be saved
+  next to it as JSON "artifacts", so they survive restarts and re-uploads.
+- Shared datasets (one per uploaded file content, used by every session that uploads
+  it) are never changed: appending needs a private copy made with fork_dataset().
+"""
+
+STORE_FOLDER = os.path.join('uploads', 'datasets')
+PART_ROWS = 250_000        # Max rows written into a single part file
+MAX_CACHED_FRAMES = 4      # How many loaded datasets we keep in memory
+SAMPLE_ROWS = int(os.environ.get('APPROX_SAMPLE_ROWS', 100_000))  # Size of the reservoir sample
+
+_store_lock = threading.Lock()
+_frame_cache = LRUCache(MAX_CACHED_FRAMES)   # dataset_id -> (version, DataFrame)
+_sample_cache = LRUCache(MAX_CACHED_FRAMES)  # dataset_id -> (version, sample DataFrame)
+
+
+def init_store(folder):
+    """Sets the folder used for the dataset store and creates it if needed."""
+    global STORE_FOLDER
+    STORE_FOLDER = folder
+    os.makedirs(STORE_FOLDER, exist_ok=True)
+
+
+# ==============================================================================
+# --- Internal helpers ---
+# ==============================================================================
+
+def _dataset_dir(dataset_id):
+    return os.path.join(STORE_FOLDER, dataset_id)
+
+
+def _meta_path(dataset_id):
+    return os.path.join(_dataset_dir(dataset_id), 'meta.json')
+
+
+def _write_meta(dataset_id, meta):
+    """Writes meta.json atomically so readers never see a half written file."""
+    tmp_path = _meta_path(dataset_id) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2, default=str)
+    os.replace(tmp_path, _meta_path(dataset_id))
+
+
+def _read_meta(dataset_id):
+    path = _meta_path(dataset_id)
+    try:
+        with open(path, encoding='utf-8') as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        raise KeyError(f"Dataset '{dataset_id}' not found.")
+    try:
+        # Reading a dataset counts as using it (the upload quota evicts the least recently used)
+        os.utime(_dataset_dir(dataset_id))
+    except OSError:
+        pass
+    return meta
+
+
+def _schema_of(df):
+    return [{'name': col, 'dtype': str(df[col].dtype)} for col in df.columns]
+
+
+def _hash_rows(df):
+    """
+    One uint64 hash per row. Integer columns are hashed as float64, so stored rows keep
+    matching after an append with missing values widens their column to float64.
+    """
+    ints = {col: 'float64' for col in df.columns if pd.api.types.is_integer_dtype(df[col])}
+    return pd.util.hash_pandas_object(df.astype(ints) if ints else df, index=False).to_numpy()
+
+
+def _row_hashes(df):
+    """One uint64 hash per row, returned sorted and unique for fast lookups."""
+    if df.empty:
+        return np.array([], dtype=np.uint64)
+    return np.unique(_hash_rows(df))
+
+
+def _profile_chunk(df):
+    """Computes mergeable per-column aggregates for a chunk of rows."""
+    profile = {}
+    for col in df.columns:
+        series = df[col]
+        non_null = series.dropna()
+        stats = {'count': int(len(non_null)), 'nulls': int(len(series) - len(non_null))}
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            values = non_null.to_numpy(dtype='float64')
+            stats['sum'] = float(values.sum())
+            stats['sum_sq'] = float(np.square(values).sum())
+            stats['min'] = float(values.min()) if len(values) else None
+            stats['max'] = float(values.max()) if len(values) else None
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            stats['min'] = non_null.min().isoformat() if len(non_null) else None
+            stats['max'] = non_null.max().isoformat() if len(non_null) else None
+        profile[col] = stats
+    return profile
+
+
+def _merge_bound(old, new, pick):
+    if old is None: return new
+    if new is None: return old
+    return pick(old, new)
+
+
+def _merge_profiles(old, new):
+    """Combines two chunk profiles without looking at the underlying rows."""
+    merged = {}
+    for col, stats in old.items():
+        add = new.get(col, {})
+        result = {'count': stats['count'] + add.get('count', 0), 'nulls': stats['nulls'] + add.get('nulls', 0)}
+        for key in ('sum', 'sum_sq'):
+            if key in stats:
+                result[key] = stats[key] + add.get(key, 0.0)
+        if 'min' in stats:
+            result['min'] = _merge_bound(stats['min'], add.get('min'), min)
+            result['max'] = _merge_bound(stats['max'], add.get('max'), max)
+        merged[col] = result
+    return merged
+
+
+def _write_parts(dataset_id, meta, df):
+    """Splits the rows into part files (plus their hash files) and records them in meta."""
+    dataset_dir = _dataset_dir(dataset_id)
+    for start in range(0, len(df), PART_ROWS):
+        chunk = df.iloc[start:start + PART_ROWS]
+        part_name = f"part-{len(meta['parts']):05d}"
+        chunk.reset_index(drop=True).to_pickle(os.path.join(dataset_dir, part_name + '.pkl'))
+        np.save(os.path.join(dataset_dir, part_name + '.hashes.npy'), _row_hashes(chunk))
+        meta['parts'].append({'name': part_name, 'rows': int(len(chunk))})
+
+
+def _find_existing_rows(dataset_id, meta, hashes):
+    """Returns a boolean mask of the hashes that already exist in the stored parts."""
+    found = np.zeros(len(hashes), dtype=bool)
+    for part in meta['parts']:
+        path = os.path.join(_dataset_dir(dataset_id), part['name'] + '.hashes.npy')
+        stored = np.load(path, mmap_mode='r')
+        if len(stored) == 0:
+            continue
+        # Hash files are sorted, so a binary search only touches a few pages per lookup
+        idx = np.minimum(np.searchsorted(stored, hashes), len(stored) - 1)
+        found |= stored[idx] == hashes
+    return found
+
+
+def _cache_put(dataset_id, version, df, cache=_frame_cache):
+    cache.put(dataset_id, (version, df))
+
+
+def _sample_path(dataset_id):
+    return os.path.join(_dataset_dir(dataset_id), 'sample.pkl')
+
+
+def _write_sample(dataset_id, version, sample):
+    sample = sample.reset_index(drop=True)
+    sample.to_pickle(_sample_path(dataset_id))
+    _cache_put(dataset_id, version, sample, _sample_cache)
+
+
+def _reservoir_update(sample, rows_seen, chunk, rng=None):
+    """
+    Vectorized reservoir sampling (Algorithm R): after the update every row seen so far
+    is in the sample with the same probability SAMPLE_ROWS / rows seen.
+    """
+    rng = rng or np.random.default_rng()
+    sample = sample.reset_index(drop=True)
+    free = max(SAMPLE_ROWS - len(sample), 0)
+    sample = pd.concat([sample, chunk.iloc[:free]], ignore_index=True)
+    rest = chunk.iloc[free:]
+    if rest.empty:
+        return sample
+
+    # Row t (0-based, counting every row seen) replaces a random slot with probability SAMPLE_ROWS / (t + 1)
+    positions = rows_seen + free + np.arange(len(rest))
+    slots = rng.integers(0, positions + 1)
+    chosen = np.flatnonzero(slots < SAMPLE_ROWS)
+    # When several new rows hit the same slot, the last one wins, as in the sequential algorithm
+    slots_rev, chosen_rev = slots[chosen][::-1], chosen[::-1]
+    replaced, first = np.unique(slots_rev, return_index=True)
+    winners = np.sort(chosen_rev[first])
+    return pd.concat([sample.drop(index=replaced), rest.iloc[winners]], ignore_index=True)
+
+
+def conform_to_schema(df, schema):
+    """
+    Checks that a new chunk has the stored columns and casts it to the stored dtypes.
+    Integer columns with missing values are widened to float64; casts that would change
+    a value (e.g. 60.5 into an integer column) are refused.
+    Raises ValueError describing every problem found.
+    """
+    df = df.copy()
+    df.columns = [str(col).strip() for col in df.columns]
+    expected = [c['name'] for c in schema]
+    missing = [c for c in expected if c not in df.columns]
+    extra = [c for c in df.columns if c not in expected]
+    problems = []
+    if missing: problems.append(f"missing columns: {', '.join(missing)}")
+    if extra: problems.append(f"unexpected columns: {', '.join(extra)}")
+    if problems:
+        raise ValueError("Schema mismatch - " + "; ".join(problems))
+
+    df = df[expected]
+    for column in schema:
+        col, dtype = column['name'], column['dtype']
+        if str(df[col].dtype) == dtype:
+            continue
+        try:
+            if dtype.startswith('datetime64'):
+                df[col] = pd.to_datetime(df[col], errors='raise').astype(dtype)
+            elif dtype == 'object':
+                df[col] = df[col].astype(object)
+            else:
+                values = pd.to_numeric(df[col], errors='raise') if df[col].dtype == 'object' else df[col]
+                if pd.api.types.is_integer_dtype(dtype) and values.isna().any():
+                    dtype = 'float64'  # Missing values: widen the integer column instead of refusing the chunk
+                converted = values.astype(dtype)
+                if pd.api.types.is_numeric_dtype(values) and pd.api.types.is_numeric_dtype(converted):
+                    lossy = values.notna() & (converted != values)
+                    if lossy.any():
+                        bad = values[lossy].iloc[0]
+                        raise ValueError(f"{bad} would be stored as {converted[lossy].iloc[0]}")
+                df[col] = converted
+        except (ValueError, TypeError) as e:
+            problems.append(f"column '{col}' cannot be stored as {dtype} ({e})")
+    if problems:
+        raise ValueError("Schema mismatch - " + "; ".join(problems))
+    return df
+
+
+# ==============================================================================
+# --- Public API ---
+# ==============================================================================
+
+def create_dataset(df, source_name, dataset_id=None, shared=False):
+    """
+    Stores a DataFrame as a new dataset and returns its id.
+    dataset_id can be given (e.g. derived from the uploaded file's content); by default a random one is used.
+    shared=True marks a dataset several sessions may use: append_rows then refuses to change it.
+    """
+    df = df.copy()
+    df.columns = [str(col).strip() for col in df.columns]
+    dataset_id = dataset_id or uuid.uuid4().hex[:12]
+    os.makedirs(_dataset_dir(dataset_id), exist_ok=True)
+
+    meta = {
+        'dataset_id': dataset_id,
+        'source_name': source_name,
+        'version': 1,
+        'row_count': int(len(df)),
+        'schema': _schema_of(df),
+        'parts': [],
+        'profile': _profile_chunk(df),
+        'shared': bool(shared),
+    }
+    with _store_lock:
+        _write_parts(dataset_id, meta, df)
+        _write_sample(dataset_id, meta['version'], _reservoir_update(df.iloc[:0], 0, df))
+        _write_meta(dataset_id, meta)
+        _cache_put(dataset_id, meta['version'], df.reset_index(drop=True))
+    print(f"✅ [dataset_store] Created dataset {dataset_id} ({len(df)} rows) from '{source_name}'.")
+    return dataset_id
+
+
+def append_rows(dataset_id, df, skip_duplicates=True):
+    """
+    Validates a new chunk against the stored schema and appends it as new parts.
+    Only the new rows are hashed and profiled; the stored parts are never re-read.
+    Rows already stored, or repeated within the chunk, are skipped unless skip_duplicates=False.
+    Returns a short report of what was appended.
+    """
+    with _store_lock:
+        meta = _read_meta(dataset_id)
+        if meta.get('shared'):
+            raise ValueError(f"Dataset '{dataset_id}' is shared and cannot be changed; append to a fork_dataset() copy.")
+        chunk = conform_to_schema(df, meta['schema']).reset_index(drop=True)
+        received = len(chunk)
+
+        if skip_duplicates and received:
+            row_hashes = _hash_rows(chunk)
+            # Rows repeated inside the chunk are skipped as well as rows that are already stored
+            duplicate = pd.Series(row_hashes).duplicated().to_numpy() | _find_existing_rows(dataset_id, meta, row_hashes)
+            chunk = chunk[~duplicate].reset_index(drop=True)
+
+        if len(chunk):
+            if _schema_of(chunk) != meta['schema']:
+                print(f"✅ [dataset_store] Widened {dataset_id} columns to {_schema_of(chunk)}.")
+                meta['schema'] = _schema_of(chunk)
+            _write_parts(dataset_id, meta, chunk)
+            sample = _reservoir_update(_load_sample_unlocked(dataset_id, meta), meta['row_count'], chunk)
+            _write_sample(dataset_id, meta['version'] + 1, sample)
+            meta['profile'] = _merge_profiles(meta['profile'], _profile_chunk(chunk))
+            meta['row_count'] += int(len(chunk))
+            meta['version'] += 1
+            _write_meta(dataset_id, meta)
+
+            # Extend the cached frame instead of reloading every part from disk
+            cached = _frame_cache.get(dataset_id)
+            if cached and cached[0] == meta['version'] - 1:
+                _cache_put(dataset_id, meta['version'], pd.concat([cached[1], chunk], ignore_index=True))
+            else:
+                _frame_cache.pop(dataset_id, None)
+
+    report = {
+        'dataset_id': dataset_id,
+        'rows_received': int(received),
+        'rows_appended': int(len(chunk)),
+        'duplicates_skipped': int(received - len(chunk)),
+        'total_rows': meta['row_count'],
+        'version': meta['version'],
+    }
+    print(f"✅ [dataset_store] Appended to {dataset_id}: {report}")
+    return report
+
+
+def fork_dataset(dataset_id, source_name=None):
+    """
+    Makes a private, appendable copy of a dataset and returns its id.
+    Part files are never rewritten, so they are hard-linked instead of copied (copied
+    where links are not supported); the sample, which appends rewrite, is copied.
+    """
+    new_id = uuid.uuid4().hex[:12]
+    with _store_lock:
+        meta = _read_meta(dataset_id)
+        source_dir, new_dir = _dataset_dir(dataset_id), _dataset_dir(new_id)
+        os.makedirs(new_dir)
+        for part in meta['parts']:
+            for suffix in ('.pkl', '.hashes.npy'):
+                source = os.path.join(source_dir, part['name'] + suffix)
+                try:
+                    os.link(source, os.path.join(new_dir, part['name'] + suffix))
+                except OSError:
+                    shutil.copyfile(source, os.path.join(new_dir, part['name'] + suffix))
+        if os.path.exists(_sample_path(dataset_id)):
+            shutil.copyfile(_sample_path(dataset_id), _sample_path(new_id))
+
+        meta = dict(meta, dataset_id=new_id, shared=False, source_name=source_name or meta['source_name'])
+        _write_meta(new_id, meta)
+        # The cached frame is only ever read or replaced, never changed in place, so it can be shared
+        cached = _frame_cache.get(dataset_id)
+        if cached and cached[0] == meta['version']:
+            _cache_put(new_id, meta['version'], cached[1])
+    print(f"✅ [dataset_store] Forked dataset {dataset_id} into {new_id}.")
+    return new_id
+
+
+def load_dataset(dataset_id, copy=True):
+    """
+    Returns the full dataset as a DataFrame.
+    By default this is a copy, so callers may modify it. Read-only callers can pass
+    copy=False to get the cached frame itself and skip the copy.
+    """
+    meta = _read_meta(dataset_id)
+    cached = _frame_cache.get(dataset_id)
+    if cached and cached[0] == meta['version']:
+        return cached[1].copy() if copy else cached[1]
+
+    parts = [pd.read_pickle(os.path.join(_dataset_dir(dataset_id), p['name'] + '.pkl')) for p in meta['parts']]
+    df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=[c['name'] for c in meta['schema']])
+    with _store_lock:
+        _cache_put(dataset_id, meta['version'], df)
+    return df.copy() if copy else df
+
+
+def _load_sample_unlocked(dataset_id, meta):
+    cached = _sample_cache.get(dataset_id)
+    if cached and cached[0] == meta['version']:
+        return cached[1]
+    if os.path.exists(_sample_path(dataset_id)):
+        sample = pd.read_pickle(_sample_path(dataset_id))
+    else:
+        # Datasets stored before samples existed get one built from their parts
+        sample, seen = None, 0
+        for part in meta['parts']:
+            chunk = pd.read_pickle(os.path.join(_dataset_dir(dataset_id), part['name'] + '.pkl'))
+            sample = _reservoir_update(chunk.iloc[:0] if sample is None else sample, seen, chunk)
+            seen += len(chunk)
+        if sample is None:
+            sample = pd.DataFrame(columns=[c['name'] for c in meta['schema']])
+        sample.to_pickle(_sample_path(dataset_id))
+    _cache_put(dataset_id, meta['version'], sample, _sample_cache)
+    return sample
+
+
+def load_sample(dataset_id):
+    """
+    Returns (sample, total_rows): a uniform random sample of at most SAMPLE_ROWS rows
+    and the number of rows in the full dataset. Treat the sample as read-only.
+    """
+    with _store_lock:
+        meta = _read_meta(dataset_id)
+        return _load_sample_unlocked(dataset_id, meta), meta['row_count']
+
+
+def iter_parts(dataset_id, meta=None):
+    """
+    Yields the dataset one stored part at a time, so callers never hold more than PART_ROWS rows.
+    Pass the meta from get_meta() to read the parts of exactly that version.
+    """
+    meta = meta or _read_meta(dataset_id)
+    for part in meta['parts']:
+        yield pd.read_pickle(os.path.join(_dataset_dir(dataset_id), part['name'] + '.pkl'))
+
+
+def dataset_exists(dataset_id):
+    return bool(dataset_id) and os.path.exists(_meta_path(dataset_id))
+
+
+def get_meta(dataset_id):
+    """Returns the stored metadata (schema, version, row count, parts)."""
+    return _read_meta(dataset_id)
+
+
+def get_version(dataset_id):
+    """Returns the current version number of a dataset (bumped on every append)."""
+    return _read_meta(dataset_id)['version']
+
+
+def delete_dataset(dataset_id):
+    """Removes a dataset from disk and from the in-memory caches."""
+    with _store_lock:
+        _frame_cache.pop(dataset_id, None)
+        _sample_cache.pop(dataset_id, None)
+        shutil.rmtree(_dataset_dir(dataset_id), ignore_errors=True)
+    print(f"✅ [dataset_store] Deleted dataset {dataset_id}.")
+
+
+def _artifact_path(dataset_id, version, name):
+    return os.path.join(_dataset_dir(dataset_id), f'{name}.v{version}.json')
+
+
+def save_artifact(dataset_id, version, name, value):
+    """
+    Saves a JSON-serializable result computed from one version of a dataset.
+    Copies of the same result for earlier versions are deleted, since nothing reads them again.
+    """
+    if not dataset_exists(dataset_id):
+        return
+    path = _artifact_path(dataset_id, version, name)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(value, f, default=str)
+    os.replace(path + '.tmp', path)
+
+    prefix = f'{name}.v'
+    for entry in os.scandir(_dataset_dir(dataset_id)):
+        stored_version = entry.name[len(prefix):-len('.json')]
+        if entry.name.startswith(prefix) and entry.name.endswith('.json') \
+                and stored_version.isdigit() and int(stored_version) < version:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass  # Already removed by a concurrent save
+
+
+def load_artifact(dataset_id, version, name):
+    """Returns a result saved with save_artifact for that version, or None."""
+    path = _artifact_path(dataset_id, version, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_profile(dataset_id):
+    """Returns the cached column profile, with mean and std derived from the running sums."""
+    profile = _read_meta(dataset_id)['profile']
+    for stats in profile.values():
+        if 'sum' in stats and stats['count']:
+            mean = stats['sum'] / stats['count']
+            stats['mean'] = mean
+            stats['std'] = float(np.sqrt(max(stats['sum_sq'] / stats['count'] - mean ** 2, 0.0)))
+    return profile
@@ -0,0 +1,200 @@
+import io
+import os
+import zlib
+import tempfile
+import itertools
+
+import pandas as pd
+
+import dataset_store
+
+"""
+On-demand exports of stored datasets.
+- Nothing is written when a processing step runs; files are only produced when a user downloads.
+- Data is read one stored part at a time and sent to the client in chunks,
+  so memory stays bounded no matter how large the dataset is.
+- CSV and Parquet are sent while they are written. XLSX is not: an .xlsx file is a zip
+  that openpyxl only assembles when the workbook is saved, so the workbook is written
+  to a temporary file first and the download starts once it is complete.
+- Supported formats: CSV, XLSX and Parquet, each optionally gzip-compressed.
+"""
+
+EXPORT_FORMATS = {
+    'csv': {'extension': 'csv', 'mimetype': 'text/csv'},
+    'xlsx': {'extension': 'xlsx', 'mimetype': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'},
+    'parquet': {'extension': 'parquet', 'mimetype': 'application/vnd.apache.parquet'},
+}
+CSV_CHUNK_ROWS = 50_000       # Rows serialized per yielded CSV chunk
+FILE_CHUNK_BYTES = 1 << 20    # Bytes per chunk when streaming a finished temp file
+EXCEL_MAX_ROWS = 1_048_575    # Excel sheet limit, minus the header row
+
+
+class _ChunkSink(io.RawIOBase):
+    """A write-only file object that hands out whatever was written since the last drain()."""
+
+    def __init__(self):
+        self._buffer = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._buffer)
+        self._buffer = []
+        return data
+
+
+def _csv_chunks(meta, parts):
+    header = True
+    for part in parts:
+        for start in range(0, len(part), CSV_CHUNK_ROWS):
+            yield part.iloc[start:start + CSV_CHUNK_ROWS].to_csv(index=False, header=header).encode('utf-8')
+            header = False
+    if header:
+        # Empty dataset: still send the column names
+        columns = [c['name'] for c in meta['schema']]
+        yield pd.DataFrame(columns=columns).to_csv(index=False).encode('utf-8')
+
+
+_TEXT_DTYPES = ('object', 'category', 'string')
+
+
+def _arrow_schema(pa, schema):
+    """
+    The Parquet schema, from the stored column dtypes rather than from the first part:
+    a column that is all null in one part would otherwise get the wrong type.
+    Text columns are written as strings.
+    """
+    fields = []
+    for column in schema:
+        if column['dtype'] in _TEXT_DTYPES:
+            arrow_type = pa.string()
+        else:
+            arrow_type = pa.Array.from_pandas(pd.Series([], dtype=column['dtype'])).type
+        fields.append(pa.field(column['name'], arrow_type))
+    return pa.schema(fields)
+
+
+def _parquet_chunks(meta, parts):
+    """Checks that the export can be written (raising ValueError) before anything is streamed."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export requires the 'pyarrow' package.")
+    schema = meta['schema']
+    try:
+        arrow_schema = _arrow_schema(pa, schema)
+    except (TypeError, ValueError, pa.ArrowException) as e:
+        raise ValueError(f"This dataset cannot be exported as Parquet: {e}")
+    text_columns = [c['name'] for c in schema if c['dtype'] in _TEXT_DTYPES]
+
+    def chunks():
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, arrow_schema)
+        for part in parts:
+            for col in text_columns:
+                part[col] = part[col].where(part[col].isna(), part[col].astype(str))
+            # Every stored part becomes one row group, flushed to the client straight away
+            writer.write_table(pa.Table.from_pandas(part, schema=arrow_schema, preserve_index=False))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+    return chunks()
+
+
+def _xlsx_chunks(meta, parts):
+    """
+    The whole workbook is saved to a temporary file before the first byte is sent: memory
+    stays bounded, but the download only starts once every row has been written. Since
+    that happens before the response starts, a failure can still be reported to the user.
+    """
+    try:
+        from openpyxl import Workbook
+        from openpyxl.utils.exceptions import IllegalCharacterError
+    except ImportError:
+        raise ValueError("XLSX export requires the 'openpyxl' package.")
+
+    # write_only workbooks keep rows in temporary files on disk instead of in memory
+    workbook = Workbook(write_only=True)
+    columns = [c['name'] for c in meta['schema']]
+    sheet, sheet_rows = None, EXCEL_MAX_ROWS
+    # An anonymous temp file is deleted when closed, even if the download is never read
+    output = tempfile.TemporaryFile()
+    try:
+        for part in parts:
+            part = part.astype(object).where(part.notna(), None)
+            for row in part.itertuples(index=False, name=None):
+                if sheet_rows >= EXCEL_MAX_ROWS:
+                    sheet = workbook.create_sheet(f"Data {len(workbook.worksheets) + 1}")
+                    sheet.append(columns)
+                    sheet_rows = 0
+                sheet.append(row)
+                sheet_rows += 1
+        if sheet is None:
+            workbook.create_sheet('Data 1').append(columns)
+        workbook.save(output)
+    except (IllegalCharacterError, TypeError, ValueError) as e:
+        output.close()
+        raise ValueError(f"This dataset cannot be exported as XLSX: {e}")
+    except BaseException:
+        output.close()
+        raise
+    output.seek(0)
+
+    def chunks():
+        with output:
+            while chunk := output.read(FILE_CHUNK_BYTES):
+                yield chunk
+    return chunks()
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _open_parts(dataset_id):
+    """
+    Reads the meta and the first part up front, so a missing dataset is reported before
+    the response starts instead of as a cut-off download. Returns (meta, parts iterator).
+    """
+    try:
+        meta = dataset_store.get_meta(dataset_id)
+        parts = dataset_store.iter_parts(dataset_id, meta)
+        first = next(parts, None)
+    except (KeyError, FileNotFoundError):
+        raise ValueError("This dataset is no longer available. Please upload the file again.")
+    return meta, parts if first is None else itertools.chain([first], parts)
+
+
+def stream_export(dataset_id, export_format='csv', use_gzip=False):
+    """
+    Returns a generator of bytes with the dataset serialized in the requested format.
+    Raises ValueError for unknown formats, for a dataset that no longer exists, or if the
+    dataset cannot be written in that format; all of these are raised before any byte is produced.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{export_format}'. Use one of: {', '.join(EXPORT_FORMATS)}.")
+    meta, parts = _open_parts(dataset_id)
+    chunks = {'csv': _csv_chunks, 'xlsx': _xlsx_chunks, 'parquet': _parquet_chunks}[export_format](meta, parts)
+    return _gzip_chunks(chunks) if use_gzip else chunks
+
+
+def export_filename(base_name, export_format='csv', use_gzip=False):
+    """Builds the download filename for an export, e.g. 'clean_sales.parquet.gz'."""
+    name = f"{os.path.splitext(base_name)[0]}.{EXPORT_FORMATS[export_format]['extension']}"
+    return name + '.gz' if use_gzip else name
@@ -0,0 +1,122 @@
+
+import numpy as np
+import pandas as pd
+
+import dataset_store
+from lru_cache import LRUCache
+
+"""
+Precomputed histograms for numeric columns.
+For every numeric column we keep, once per dataset version:
+- a fine base histogram (BASE_BINS equal-width bins) stored as prefix sums,
+- the same on a log10 scale for the positive values,
+- BASE_BINS + 1 quantiles for equal-count bins.
+Any coarser bin count is made by merging neighbouring base bins, which only
+needs a few lookups in the prefix sums, whatever the number of rows.
+They are built by the speculative precompute after an upload/append, or on first
+use; never inside the upload or append request itself.
+"""
+
+BASE_BINS = 1024
+BIN_SCALES = ('linear', 'log', 'quantile')
+MAX_CACHED_DATASETS = 8
+
+_pyramid_cache = LRUCache(MAX_CACHED_DATASETS)  # (dataset_id, version) -> {column: pyramid}
+
+
+def _prefix_histogram(values):
+    counts, edges = np.histogram(values, bins=BASE_BINS)
+    return {'edges': edges, 'cum': np.concatenate([[0], np.cumsum(counts)])}
+
+
+def build_pyramid(series):
+    """Builds the base histograms for one column. All later bin counts are derived from this."""
+    values = pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    values = values[np.isfinite(values)]
+    pyramid = {'count': int(len(values))}
+    if not len(values):
+        return pyramid
+
+    pyramid['linear'] = _prefix_histogram(values)
+    positive = values[values > 0]
+    if len(positive):
+        log_hist = _prefix_histogram(np.log10(positive))
+        log_hist['edges'] = np.power(10.0, log_hist['edges'])
+        log_hist['excluded'] = int(len(values) - len(positive))
+        pyramid['log'] = log_hist
+    pyramid['quantiles'] = np.quantile(values, np.linspace(0, 1, BASE_BINS + 1))
+    return pyramid
+
+
+def _merge_equal_width(hist, bins):
+    """Merges neighbouring base bins into `bins` bins (exact when bins divides BASE_BINS)."""
+    idx = np.unique(np.round(np.linspace(0, BASE_BINS, bins + 1)).astype(int))
+    return hist['edges'][idx], np.diff(hist['cum'][idx])
+
+
+def _merge_quantiles(quantiles, count, bins):
+    """
+    Equal-count bins. Bins that collapse onto the same edge (tied values) are merged,
+    and counts are read from the full quantile sketch so ties are counted correctly.
+    """
+    idx = np.round(np.linspace(0, BASE_BINS, bins + 1)).astype(int)
+    edges = np.unique(quantiles[idx])
+    if len(edges) == 1:
+        return np.array([edges[0], edges[0]]), np.array([count])
+    # Share of the values <= each edge, to within 1 / BASE_BINS
+    cum = (np.searchsorted(quantiles, edges, side='right') - 1) * count / BASE_BINS
+    cum[0] = 0
+    return edges, np.round(np.diff(cum)).astype(int)
+
+
+def render(pyramid, bins, scale='linear', name=''):
+    """Returns Chart.js histogram data with `bins` bins on the given scale."""
+    if scale not in BIN_SCALES:
+        raise ValueError(f"Unsupported bin scale '{scale}'. Use one of: {', '.join(BIN_SCALES)}.")
+    bins = min(max(int(bins), 1), BASE_BINS)
+    label = f'Distribution of {name}'
+
+    if pyramid['count'] == 0:
+        edges, counts = np.array([]), np.array([])
+    elif scale == 'quantile':
+        edges, counts = _merge_quantiles(pyramid['quantiles'], pyramid['count'], bins)
+        label += ' (equal-count bins)'
+    elif scale == 'log':
+        if 'log' not in pyramid:
+            raise ValueError(f'Column "{name}" has no positive values for a log scale.')
+        edges, counts = _merge_equal_width(pyramid['log'], bins)
+        label += ' (log scale)'
+        if pyramid['log']['excluded']:
+            label += f", {pyramid['log']['excluded']} values <= 0 left out"
+    else:
+        edges, counts = _merge_equal_width(pyramid['linear'], bins)
+
+    edge_format = '{:.1f}' if scale == 'linear' else '{:.3g}'
+    labels = [f'{edge_format.format(edges[i])}-{edge_format.format(edges[i + 1])}' for i in range(len(edges) - 1)]
+    return {'labels': labels, 'datasets': [{'label': label, 'data': [float(c) for c in counts]}]}
+
+
+def precompute(dataset_id):
+    """Builds the histograms of every numeric column for the current dataset version."""
+    version = dataset_store.get_version(dataset_id)
+    key = (dataset_id, version)
+    pyramids = _pyramid_cache.get(key)
+    if pyramids is not None:
+        return pyramids
+
+    df = dataset_store.load_dataset(dataset_id, copy=False)
+    pyramids = {
+        col: build_pyramid(df[col]) for col in df.columns
+        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])
+    }
+    _pyramid_cache.put(key, pyramids)
+    print(f"✅ [histograms] Precomputed histograms for {dataset_id} v{version} ({len(pyramids)} columns).")
+    return pyramids
+
+
+def get_histogram(dataset_id, column, bins, scale='linear'):
+    """Histogram of a stored column, derived from the precomputed base histogram."""
+    pyramids = precompute(dataset_id)
+    if column not in pyramids:
+        raise ValueError(f'Column "{column}" must be numeric for a histogram.')
+    return render(pyramids[column], bins, scale, column)
@@ -0,0 +1,363 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import dataset_store
+from lru_cache import LRUCache
+import schema_catalog
+
+"""
+Local insight engine: the common findings about a dataset, computed with pandas/numpy
+over ALL rows instead of asking an AI to guess them from a few sample rows.
+- top contributors: categories that make up most of a measure's total
+- correlations: the strongest linear relationships between measures
+- trends: measures that go up or down over time
+- seasonality: day-of-week / month-of-year patterns
+- skew: measures dominated by a long tail
+- missing values: columns with many nulls, and segments where the nulls concentrate
+- segment differences: measures whose average differs a lot between categories
+Every finding gets a score between 0 and 1 (an effect size, weighted by kind) and the
+list is ranked by it. Results are cached per dataset version, like the catalog.
+The AI is then only needed to phrase the findings (see summary.py).
+"""
+
+MAX_FINDINGS = 12
+MAX_PER_KIND = 3
+MAX_MEASURES = 30
+MAX_DIMENSIONS = 10
+MAX_SEGMENTS = 50  # Dimensions with more distinct values are not compared segment by segment
+MIN_SEGMENT_ROWS = 30
+MIN_SCORE = 0.1
+MAX_CACHED_INSIGHTS = 16
+
+# How interesting a kind of finding is, relative to the others, for the same effect size
+KIND_WEIGHTS = {
+    'trend': 1.0,
+    'correlation': 1.0,
+    'top_contributors': 0.9,
+    'segment_difference': 0.9,
+    'seasonality': 0.9,
+    'null_hotspot': 0.8,
+    'missing_values': 0.7,
+    'skew': 0.6,
+}
+
+_insight_cache = LRUCache(MAX_CACHED_INSIGHTS)  # (dataset_id, version) -> list of findings
+
+
+def _fmt(value):
+    value = float(value)
+    return f'{value:,.0f}' if abs(value) >= 1000 else f'{value:,.2f}'
+
+
+def _pct(value):
+    return f'{100 * float(value):.0f}%'
+
+
+def _finding(kind, columns, effect, text, **details):
+    return {
+        'kind': kind,
+        'columns': list(columns),
+        'score': round(float(min(max(effect, 0.0), 1.0)) * KIND_WEIGHTS[kind], 4),
+        'text': text,
+        'details': details,
+    }
+
+
+def _eta_squared(group_means, group_counts, overall_mean, total_ss):
+    """
+    Share of a measure's variance explained by the groups (0 = none, 1 = all),
+    adjusted for the share that many groups with few values each explain by chance.
+    """
+    if total_ss <= 0:
+        return 0.0
+    n, k = group_counts.sum(), len(group_means)
+    eta = (group_counts * (group_means - overall_mean) ** 2).sum() / total_ss
+    return float(max(0.0, 1 - (1 - eta) * (n - 1) / max(n - k, 1)))
+
+
+# ==============================================================================
+# --- Findings ---
+# ==============================================================================
+
+def _correlations(df, measures):
+    if len(measures) < 2 or len(df) < 10:
+        return []
+    corr = df[measures].corr().to_numpy()
+    upper = np.triu_indices(len(measures), k=1)
+    findings = []
+    for i, j, r in zip(upper[0], upper[1], corr[upper]):
+        if np.isnan(r) or abs(r) < 0.3:
+            continue
+        direction = 'rise together' if r > 0 else 'move in opposite directions'
+        strength = 'strongly' if abs(r) >= 0.7 else 'moderately'
+        findings.append(_finding(
+            'correlation', (measures[i], measures[j]), abs(r),
+            f"'{measures[i]}' and '{measures[j]}' {strength} {direction} (correlation {r:+.2f}).",
+            correlation=float(r)))
+    return findings
+
+
+def _segments(df, measures, dimensions):
+    """Top contributors and segment differences: one groupby per dimension covers every measure."""
+    findings = []
+    if not measures:
+        return findings
+    means = df[measures].mean()
+    total_ss = df[measures].var() * (df[measures].count() - 1)
+    totals = df[measures].sum()
+    non_negative = df[measures].min() >= 0
+
+    for dim in dimensions:
+        grouped = df.groupby(dim, observed=True)[measures]
+        sums, group_means, counts = grouped.sum(), grouped.mean(), grouped.count()
+        row_shares = df[dim].value_counts(normalize=True)
+        k = len(sums)
+        if k < 2:
+            continue
+        for measure in measures:
+            # Shares of a total only make sense when nothing is negative
+            if non_negative[measure] and totals[measure] > 0:
+                shares = (sums[measure] / totals[measure]).sort_values(ascending=False)
+                top, top_share = shares.index[0], shares.iloc[0]
+                row_share = row_shares.get(top, 0.0)
+                # A big share only because the category has most of the rows is less interesting
+                concentration = (top_share - 1 / k) / (1 - 1 / k)
+                lift = abs(top_share - row_share) / row_share if row_share else 1.0
+                text = (f"'{top}' accounts for {_pct(top_share)} of total '{measure}' "
+                        f"(from {_pct(row_share)} of the rows) across {k} '{dim}' values")
+                if k > 5:
+                    text += f"; the top 3 make up {_pct(shares.iloc[:3].sum())}"
+                findings.append(_finding(
+                    'top_contributors', (measure, dim), 0.5 * concentration + 0.5 * min(1.0, lift), text + '.',
+                    top=str(top), share=float(top_share), row_share=float(row_share), segments=k))
+
+            large = counts[measure] >= MIN_SEGMENT_ROWS
+            if large.sum() < 2:
+                continue
+            m, n = group_means[measure][large], counts[measure][large]
+            eta = _eta_squared(m, n, means[measure], total_ss[measure])
+            high, low = m.idxmax(), m.idxmin()
+            findings.append(_finding(
+                'segment_difference', (measure, dim), eta,
+                f"Average '{measure}' differs by '{dim}': {_fmt(m[high])} for '{high}' vs {_fmt(m[low])} for '{low}' "
+                f"({_pct(eta)} of its variation is explained by '{dim}').",
+                highest=str(high), lowest=str(low), eta_squared=eta))
+    return findings
+
+
+def _bucket_frequency(span):
+    if span >= pd.Timedelta(days=730):
+        return 'M'
+    if span >= pd.Timedelta(days=90):
+        return 'W'
+    return 'D'
+
+
+def _trends(df, time_col, measures):
+    times = df[time_col]
+    if times.notna().sum() < 10 or not measures:
+        return []
+    span = times.max() - times.min()
+    freq = _bucket_frequency(span)
+    buckets = times.dt.to_period(freq).dt.start_time
+    grouped = df[measures].groupby(buckets)
+    sums, counts = grouped.sum(), grouped.size()
+    # A half-filled first or last period would look like a drop
+    typical = counts.median()
+    keep = counts >= 0.5 * typical
+    sums = sums[keep.to_numpy()]
+    if len(sums) < 6:
+        return []
+
+    x = np.arange(len(sums), dtype=float)
+    y = sums.to_numpy(dtype=float)
+    x_c = x - x.mean()
+    y_c = y - y.mean(axis=0)
+    slope = (x_c @ y_c) / (x_c @ x_c)
+    denom = np.sqrt((x_c @ x_c) * (y_c ** 2).sum(axis=0))
+    r = np.divide(x_c @ y_c, denom, out=np.zeros_like(slope), where=denom > 0)
+    period = {'D': 'day', 'W': 'week', 'M': 'month'}[freq]
+
+    findings = []
+    for i, measure in enumerate(measures):
+        level = abs(y[:, i].mean())
+        if level == 0:
+            continue
+        change = slope[i] * (len(x) - 1) / level
+        if abs(change) < 0.1:
+            continue
+        direction = 'upward' if slope[i] > 0 else 'downward'
+        findings.append(_finding(
+            'trend', (measure, time_col), r[i] ** 2 * min(1.0, abs(change)),
+            f"Total '{measure}' per {period} trends {direction} over '{time_col}' "
+            f"({change:+.0%} across {len(x)} {period}s, R² {r[i] ** 2:.2f}).",
+            change=float(change), r_squared=float(r[i] ** 2), periods=len(x), granularity=period))
+    return findings
+
+
+def _seasonality(df, time_col, measures):
+    times = df[time_col]
+    if times.notna().sum() < 10 or not measures:
+        return []
+    span = times.max() - times.min()
+    patterns = []
+    if span >= pd.Timedelta(days=28):
+        daily = df[measures].groupby(times.dt.floor('D')).sum()
+        patterns.append(('day of week', 'day', daily, daily.index.day_name().str[:3]))
+    if span >= pd.Timedelta(days=730):
+        monthly = df[measures].groupby(times.dt.to_period('M').dt.start_time).sum()
+        patterns.append(('month of year', 'month', monthly, monthly.index.month_name().str[:3]))
+
+    findings = []
+    for label, unit, periods, season in patterns:
+        # A linear trend would swamp the seasonal variance, so the groups are compared on what is left after removing it
+        x = ((periods.index - periods.index[0]) / pd.Timedelta(days=1)).to_numpy(dtype='float64')
+        x_c = x - x.mean()
+        y_c = periods.to_numpy(dtype='float64') - periods.to_numpy(dtype='float64').mean(axis=0)
+        slope = (x_c @ y_c) / (x_c @ x_c) if (x_c @ x_c) > 0 else np.zeros(len(measures))
+        residuals = pd.DataFrame(y_c - np.outer(x_c, slope), index=periods.index, columns=measures)
+
+        season_keys = np.asarray(season)
+        grouped = residuals.groupby(season_keys)
+        effects, season_counts = grouped.mean(), grouped.size()
+        season_means = periods.groupby(season_keys).mean()
+        total_ss = (residuals ** 2).sum()
+        for measure in measures:
+            eta = _eta_squared(effects[measure], season_counts, 0.0, total_ss[measure])
+            if eta < 0.2:
+                continue
+            high, low = effects[measure].idxmax(), effects[measure].idxmin()
+            findings.append(_finding(
+                'seasonality', (measure, time_col), eta,
+                f"'{measure}' follows a {label} pattern: highest on {high} ({_fmt(season_means[measure][high])} per {unit} on average, "
+                f"{_fmt(effects[measure][high])} above trend), lowest on {low} ({_fmt(season_means[measure][low])}, "
+                f"{_fmt(-effects[measure][low])} below trend).",
+                pattern=label, highest=high, lowest=low, eta_squared=eta))
+    return findings
+
+
+def _skew(df, measures):
+    if not measures or len(df) < 10:
+        return []
+    skews = df[measures].skew()
+    means, medians = df[measures].mean(), df[measures].median()
+    findings = []
+    for measure in measures:
+        value = skews[measure]
+        if np.isnan(value) or abs(value) < 1:
+            continue
+        tail = 'high' if value > 0 else 'low'
+        findings.append(_finding(
+            'skew', (measure,), (abs(value) - 1) / 9,
+            f"'{measure}' is skewed with a long {tail} tail (skewness {value:.1f}): "
+            f"mean {_fmt(means[measure])} vs median {_fmt(medians[measure])}.",
+            skewness=float(value)))
+    return findings
+
+
+def _missing(df, dimensions):
+    null_share = df.isna().mean()
+    null_cols = [col for col in df.columns if null_share[col] >= 0.01]
+    findings = [
+        _finding('missing_values', (col,), null_share[col],
+                 f"'{col}' is missing in {_pct(null_share[col])} of rows.", share=float(null_share[col]))
+        for col in null_cols if null_share[col] >= 0.05
+    ]
+    # Hot-spots: segments where a column is missing far more often than overall
+    for dim in dimensions:
+        checked = [col for col in null_cols if col != dim]
+        if not checked:
+            continue
+        grouped = df[checked].isna().groupby(df[dim], observed=True)
+        rates, sizes = grouped.mean(), grouped.size()
+        rates = rates[(sizes >= max(MIN_SEGMENT_ROWS, 0.01 * len(df))).to_numpy()]
+        for col in checked:
+            if rates.empty:
+                break
+            segment = rates[col].idxmax()
+            rate, overall = rates[col][segment], null_share[col]
+            if rate < 2 * overall or rate - overall < 0.1:
+                continue
+            findings.append(_finding(
+                'null_hotspot', (col, dim), rate - overall,
+                f"'{col}' is missing in {_pct(rate)} of rows where '{dim}' is '{segment}' (vs {_pct(overall)} overall).",
+                segment=str(segment), rate=float(rate), overall=float(overall)))
+    return findings
+
+
+# ==============================================================================
+# --- Public API ---
+# ==============================================================================
+
+def rank_findings(findings, max_findings=MAX_FINDINGS):
+    """Highest scores first, with at most MAX_PER_KIND findings of the same kind."""
+    ranked, per_kind = [], {}
+    for finding in sorted(findings, key=lambda f: f['score'], reverse=True):
+        if finding['score'] < MIN_SCORE or per_kind.get(finding['kind'], 0) >= MAX_PER_KIND:
+            continue
+        per_kind[finding['kind']] = per_kind.get(finding['kind'], 0) + 1
+        ranked.append(finding)
+        if len(ranked) == max_findings:
+            break
+    return ranked
+
+
+def compute_insights(df, catalog):
+    """Computes and ranks the findings for a DataFrame (with its date columns already parsed)."""
+    by_name = catalog['by_name']
+    measures = [c for c in catalog['roles']['measure'] if by_name[c]['kind'] == 'numeric'][:MAX_MEASURES]
+    dimensions = [
+        c for c in catalog['roles']['dimension']
+        if 2 <= by_name[c]['cardinality'] <= MAX_SEGMENTS
+    ][:MAX_DIMENSIONS]
+    time_col = next((c for c in catalog['roles']['time'] if pd.api.types.is_datetime64_any_dtype(df[c])), None)
+
+    findings = []
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # Constant columns give harmless divide-by-zero warnings
+        findings += _correlations(df, measures)
+        findings += _segments(df, measures, dimensions)
+        if time_col:
+            findings += _trends(df, time_col, measures)
+            findings += _seasonality(df, time_col, measures)
+        findings += _skew(df, measures)
+        findings += _missing(df, dimensions)
+    return rank_findings(findings)
+
+
+def get_insights(dataset_id):
+    """Returns the ranked findings for the current version of a stored dataset (cached)."""
+    version = dataset_store.get_version(dataset_id)
+    key = (dataset_id, version)
+    findings = _insight_cache.get(key)
+    if findings is not None:
+        return findings
+
+    findings = dataset_store.load_artifact(dataset_id, version, 'insights')
+    if findings is None:
+        catalog = schema_catalog.get_catalog(dataset_id)
+        df = schema_catalog.apply_catalog_types(dataset_store.load_dataset(dataset_id), catalog)
+        findings = compute_insights(df, catalog)
+        dataset_store.save_artifact(dataset_id, version, 'insights', findings)
+        print(f"✅ [insight_engine] Computed {len(findings)} findings for {dataset_id} v{version}.")
+    _insight_cache.put(key, findings)
+    return findings
+
+
+def findings_to_markdown(findings, catalog):
+    """A plain summary of the findings, used when no AI is available to phrase them."""
+    lines = [
+        '## Overview',
+        f"{catalog['row_count']:,} rows and {len(catalog['columns'])} columns "
+        f"(measures: {len(catalog['roles']['measure'])}, dimensions: {len(catalog['roles']['dimension'])}, "
+        f"date columns: {len(catalog['roles']['time'])}).",
+        '',
+        '## Key Findings',
+    ]
+    issues = [f for f in findings if f['kind'] in ('missing_values', 'null_hotspot')]
+    lines += [f"- {f['text']}" for f in findings if f not in issues] or ['- No strong patterns were found.']
+    if issues:
+        lines += ['', '## Potential Issues'] + [f"- {f['text']}" for f in issues]
+    return '\n'.join(lines)
@@ -0,0 +1,45 @@
+import importlib
+import threading
+
+"""
+Deferred imports for fast worker startup.
+    pd = lazy_import('pandas')
+binds a stand-in that imports pandas the first time one of its attributes is used,
+so importing main.py does not pay for pandas, the AI SDKs or weasyprint until a
+request actually needs them. Modules that main.py itself imports at startup
+(speculation, upload_store) import their heavy dependencies this way too.
+Safe to use from several threads at once.
+"""
+
+_import_lock = threading.RLock()
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access."""
+
+    def __init__(self, name, on_load=None):
+        self._name = name
+        self._on_load = on_load
+        self._module = None
+
+    def _load(self):
+        with _import_lock:
+            if self._module is None:
+                module = importlib.import_module(self._name)
+                if self._on_load:
+                    self._on_load(module)
+                self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        # Only called for names not set in __init__, i.e. the module's own attributes
+        return getattr(self._module or self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded yet'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name, on_load=None):
+    """Returns a LazyModule for `name`. on_load(module) runs once, right after the real import."""
+    return LazyModule(name, on_load)
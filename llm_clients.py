@@ -0,0 +1,80 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+
+"""
+One place to get API clients for the LLM providers.
+Clients are built on first use (the SDKs are only imported then) and reused after that.
+Keys and endpoints come from the environment / .env file:
+    GROQ_API_KEY, GROQ_BASE_URL (optional)
+    OPENROUTER_API_KEY, OPENROUTER_BASE_URL (optional)
+A missing key raises a clear error when the feature is used instead of
+silently leaving a client set to None.
+"""
+
+PROVIDERS = {
+    'groq': {
+        'key_env': 'GROQ_API_KEY',
+        'base_url_env': 'GROQ_BASE_URL',
+        'default_base_url': None,  # The Groq SDK's own default
+    },
+    'openrouter': {
+        'key_env': 'OPENROUTER_API_KEY',
+        'base_url_env': 'OPENROUTER_BASE_URL',
+        'default_base_url': 'https://openrouter.ai/api/v1',
+    },
+}
+
+_clients = {}
+_clients_lock = threading.Lock()
+_env_loaded = False
+
+
+def _load_env():
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
+
+
+def _openrouter_headers():
+    # Optional headers for OpenRouter analytics
+    return {
+        'HTTP-Referer': os.environ.get('YOUR_SITE_URL') or 'INSIGHT_IQ_APP',
+        'X-Title': os.environ.get('YOUR_SITE_NAME') or 'Insight IQ AI Assistant',
+    }
+
+
+def _build_client(name, api_key, base_url):
+    if name == 'groq':
+        from groq import Groq
+        return Groq(api_key=api_key, base_url=base_url) if base_url else Groq(api_key=api_key)
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, base_url=base_url, default_headers=_openrouter_headers())
+
+
+def is_configured(name):
+    """True if the provider's API key is set. Does not build the client."""
+    _load_env()
+    return bool(os.environ.get(PROVIDERS[name]['key_env']))
+
+
+def get_client(name):
+    """Returns the (shared) client for 'groq' or 'openrouter'. Raises ConnectionError if it is not configured."""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{name}'.")
+    if name in _clients:
+        return _clients[name]
+
+    _load_env()
+    provider = PROVIDERS[name]
+    with _clients_lock:
+        if name not in _clients:
+            api_key = os.environ.get(provider['key_env'])
+            if not api_key:
+                raise ConnectionError(f"{provider['key_env']} is not set. Add it to your environment or .env file.")
+            base_url = os.environ.get(provider['base_url_env']) or provider['default_base_url']
+            _clients[name] = _build_client(name, api_key, base_url)
+            print(f"✅ [llm_clients] {name} client initialized" + (f" ({base_url})." if base_url else "."))
+    return _clients[name]
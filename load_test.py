@@ -0,0 +1,386 @@
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import shlex
+import socket
+import argparse
+import shutil
+import tempfile
+import threading
+import subprocess
+import http.cookiejar
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+import stub_llm
+
+"""
+End-to-end load test: many virtual users replaying realistic sessions against the app.
+- starts the stub LLM server (stub_llm.py) and the app in its own process(es), with
+  GROQ_BASE_URL / OPENROUTER_BASE_URL pointing at the stub, in a temporary working folder
+  (uploads and app.log; deleted afterwards unless --keep-workdir is given)
+- every virtual user keeps its own session cookie and repeats the journey
+  upload -> process -> custom charts -> AI dashboard -> summary -> PDF until the time is up
+- reports throughput, p50/p95/p99 latency and error rate per route, and the peak
+  memory of the app's processes (read from /proc, so Linux only)
+The app command is a template, so deployment configurations can be compared:
+    python load_test.py --users 20 --duration 60
+    python load_test.py --users 20 --app-cmd "gunicorn -w 4 --threads 4 -b 127.0.0.1:{port} main:app"
+    python load_test.py --url http://127.0.0.1:5000 --users 5   # an app that is already running
+Only the standard library is used.
+"""
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_APP_CMD = f'{shlex.quote(sys.executable)} -m flask --app main run --port {{port}} --with-threads --no-reload'
+COLUMNS = ['date', 'region', 'product', 'units', 'sales']
+
+# A 1x1 PNG, enough for the image-insight routes (the stub does not look at it)
+CHART_IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8'
+               'z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg==')
+
+
+# ==============================================================================
+# --- Test data ---
+# ==============================================================================
+
+def make_csv(rows, seed):
+    """A sales-like CSV. Different seeds give different files (and so different datasets)."""
+    rng = random.Random(seed)
+    lines = [','.join(COLUMNS)]
+    for _ in range(rows):
+        units = rng.randint(1, 40)
+        lines.append(f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d},R{rng.randint(1, 6)},'
+                     f'P{rng.randint(1, 25)},{units},{units * rng.uniform(5, 50):.2f}')
+    return '\n'.join(lines).encode()
+
+
+def _multipart(fields, files):
+    """Encodes form fields and (name, filename, bytes) files as multipart/form-data."""
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, filename, data in files:
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                   f'Content-Type: application/octet-stream\r\n\r\n'.encode())
+        body.write(data)
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+# ==============================================================================
+# --- Virtual users ---
+# ==============================================================================
+
+class VirtualUser:
+    """One browser: its own cookie jar (Flask session), replaying the user journey."""
+
+    def __init__(self, base_url, results, files, think_time, timeout):
+        self.base_url = base_url
+        self.results = results
+        self.files = files
+        self.think_time = think_time
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, route, method, path, json_body=None, form=None, files=None):
+        """Sends one request and records (route, status, seconds). Returns the parsed JSON body, if any."""
+        headers, data = {}, None
+        if files is not None:
+            data, headers['Content-Type'] = _multipart(form or {}, files)
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+
+        started = time.perf_counter()
+        status, payload = 0, b''
+        try:
+            with self.opener.open(urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method),
+                                  timeout=self.timeout) as response:
+                status, payload = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, payload = e.code, e.read()
+        except (urllib.error.URLError, OSError) as e:
+            payload = str(e).encode()
+        self.results.append((route, status, time.perf_counter() - started))
+        if self.think_time:
+            time.sleep(random.uniform(0.5, 1.5) * self.think_time)
+        try:
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    def run_session(self):
+        """Upload -> process -> custom charts -> AI dashboard -> summary -> PDF."""
+        self.request('GET /', 'GET', '/')
+        self.request('GET /upload', 'GET', '/upload')
+        filename, data = random.choice(self.files)
+        self.request('POST /upload', 'POST', '/upload', files=[('file', filename, data)])
+
+        self.request('GET /process', 'GET', '/process')
+        self.request('POST /api/data-grid', 'POST', '/api/data-grid', json_body={'offset': 0, 'limit': 100, 'include_stats': True})
+        self.request('POST /process', 'POST', '/process', form={'processing_step': 'cleaning'})
+        self.request('POST /api/data-grid', 'POST', '/api/data-grid',
+                     json_body={'offset': 100, 'limit': 100, 'sort': {'column': 'sales', 'descending': True}})
+
+        self.request('GET /custom-chart', 'GET', '/custom-chart')
+        for body in ({'chartType': 'bar', 'x_axis': 'region', 'y_axis': 'sales'},
+                     {'chartType': 'line', 'x_axis': 'date', 'y_axis': 'units'},
+                     {'chartType': 'histogram', 'x_axis': 'sales', 'bins': random.choice([10, 20, 50])}):
+            self.request('POST /api/generate-chart', 'POST', '/api/generate-chart', json_body=body)
+        self.request('POST /api/get-chart-insight', 'POST', '/api/get-chart-insight', json_body={'imageData': CHART_IMAGE})
+
+        self.request('GET /ai-chart', 'GET', '/ai-chart')
+        configs = self.request('POST /api/get-ai-dashboard-configs', 'POST', '/api/get-ai-dashboard-configs', json_body={})
+        for config in (configs if isinstance(configs, list) else [])[:4]:
+            self.request('POST /api/generate-chart', 'POST', '/api/generate-chart',
+                         json_body={'chartType': config.get('chartType'), 'x_axis': config.get('x_column'), 'y_axis': config.get('y_column')})
+        self.request('POST /api/get-ai-chart-config', 'POST', '/api/get-ai-chart-config', json_body={'prompt': 'total sales by region'})
+
+        self.request('GET /summary-generator', 'GET', '/summary-generator')
+        summary = self.request('POST /api/generate-full-summary', 'POST', '/api/generate-full-summary', json_body={})
+        text = summary.get('summary', '') if isinstance(summary, dict) else ''
+        self.request('POST /api/download-summary-pdf', 'POST', '/api/download-summary-pdf',
+                     json_body={'html_content': f'<p>{text or "Summary"}</p>'})
+
+
+def _user_loop(user, deadline, sessions_done):
+    while time.time() < deadline:
+        user.run_session()
+        sessions_done.append(1)
+
+
+# ==============================================================================
+# --- App process and memory ---
+# ==============================================================================
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(base_url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f'The app exited during startup (code {process.returncode}).')
+        try:
+            urllib.request.urlopen(base_url + '/upload', timeout=2).read()
+            return
+        except urllib.error.HTTPError:
+            return  # Any HTTP answer means the server is listening
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f'The app did not answer on {base_url} within {timeout}s.')
+
+
+def _process_tree(root_pid):
+    """The pid and all descendants (e.g. gunicorn workers), from /proc."""
+    children = defaultdict(list)
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+                children[ppid].append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def _rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def _watch_memory(root_pid, peaks, stop, interval=0.5):
+    """Keeps the peak RSS of every process of the app (MB) until stop is set."""
+    while not stop.is_set():
+        tree = _process_tree(root_pid)
+        for pid in tree:
+            peaks[pid] = max(peaks.get(pid, 0.0), _rss_mb(pid))
+        peaks['total'] = max(peaks.get('total', 0.0), sum(_rss_mb(pid) for pid in tree))
+        stop.wait(interval)
+
+
+# ==============================================================================
+# --- Report ---
+# ==============================================================================
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(q / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(results, seconds, sessions, memory):
+    """Per-route and overall numbers as a JSON-friendly dict."""
+    by_route = defaultdict(list)
+    for route, status, duration in results:
+        by_route[route].append((status, duration))
+
+    routes = {}
+    for route, samples in sorted(by_route.items()):
+        durations = sorted(d for _, d in samples)
+        errors = sum(1 for status, _ in samples if status == 0 or status >= 400)
+        routes[route] = {
+            'requests': len(samples),
+            'errors': errors,
+            'error_rate': errors / len(samples),
+            'statuses': {str(s): sum(1 for status, _ in samples if status == s) for s in sorted({s for s, _ in samples})},
+            'p50_ms': percentile(durations, 50) * 1000,
+            'p95_ms': percentile(durations, 95) * 1000,
+            'p99_ms': percentile(durations, 99) * 1000,
+            'max_ms': durations[-1] * 1000,
+        }
+    total_errors = sum(r['errors'] for r in routes.values())
+    return {
+        'duration_seconds': seconds,
+        'sessions': sessions,
+        'requests': len(results),
+        'throughput_rps': len(results) / seconds if seconds else 0.0,
+        'error_rate': total_errors / len(results) if results else 0.0,
+        'routes': routes,
+        'memory_mb': memory,
+    }
+
+
+def print_report(report):
+    print(f"\n{'route':<36}{'reqs':>7}{'err%':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  statuses")
+    for route, r in report['routes'].items():
+        statuses = ' '.join(f'{code}x{count}' for code, count in r['statuses'].items())
+        print(f"{route:<36}{r['requests']:>7}{100 * r['error_rate']:>6.1f}%{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+              f"{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}  {statuses}")
+    print(f"\n{report['requests']} requests in {report['duration_seconds']:.1f}s "
+          f"({report['throughput_rps']:.1f} req/s, {report['sessions']} sessions), "
+          f"error rate {100 * report['error_rate']:.1f}%")
+    memory = report['memory_mb']
+    if memory:
+        # Short-lived helper processes (a few MB each) are left out of the per-process list
+        workers = ', '.join(f'{mb:.0f}' for pid, mb in memory.items() if pid != 'total' and mb >= 10)
+        print(f"Peak memory: {memory['total']:.0f} MB total (app processes: {workers} MB)")
+
+
+# ==============================================================================
+# --- Main ---
+# ==============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the app with virtual users and a stub LLM server.')
+    parser.add_argument('--users', type=int, default=10, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to keep starting new sessions')
+    parser.add_argument('--ramp-up', type=float, default=5, help='seconds over which the users start')
+    parser.add_argument('--think-time', type=float, default=0.0, help='average pause between requests (s)')
+    parser.add_argument('--timeout', type=float, default=120, help='per-request timeout (s)')
+    parser.add_argument('--rows', type=int, default=20000, help='rows in each uploaded CSV')
+    parser.add_argument('--distinct-files', type=int, default=4,
+                        help='different files the users pick from (the same file uploaded twice is reused by the app)')
+    parser.add_argument('--app-cmd', default=DEFAULT_APP_CMD, help='command that starts the app; {port} is filled in')
+    parser.add_argument('--url', help='test an app that is already running instead of starting one')
+    parser.add_argument('--stub-latency-ms', type=float, default=stub_llm.DEFAULT_SETTINGS['latency_ms'])
+    parser.add_argument('--stub-tokens-per-second', type=float, default=stub_llm.DEFAULT_SETTINGS['tokens_per_second'])
+    parser.add_argument('--stub-error-rate', type=float, default=0.0)
+    parser.add_argument('--json', help='also write the report to this file (to compare configurations)')
+    parser.add_argument('--max-error-rate', type=float, help='exit with status 1 above this overall error rate')
+    parser.add_argument('--keep-workdir', action='store_true', help="keep the app's working folder (uploads, app.log)")
+    args = parser.parse_args(argv)
+
+    stub, stub_url = stub_llm.start_stub(
+        latency_ms=args.stub_latency_ms, tokens_per_second=args.stub_tokens_per_second,
+        error_rate=args.stub_error_rate, columns=COLUMNS)
+    print(f"✅ [load_test] Stub LLM server on {stub_url}")
+
+    process, work_dir, log = None, None, None
+    base_url = args.url.rstrip('/') if args.url else None
+    try:
+        if base_url is None:
+            port = _free_port()
+            work_dir = tempfile.mkdtemp(prefix='insightiq-load-')
+            env = dict(os.environ,
+                       PYTHONPATH=APP_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''),
+                       GROQ_API_KEY='stub', GROQ_BASE_URL=stub_url,
+                       OPENROUTER_API_KEY='stub', OPENROUTER_BASE_URL=stub_url + '/v1')
+            log = open(os.path.join(work_dir, 'app.log'), 'w')
+            command = args.app_cmd.format(port=port)
+            process = subprocess.Popen(shlex.split(command), cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+            base_url = f'http://127.0.0.1:{port}'
+            print(f"✅ [load_test] Starting the app: {command} (log: {log.name})")
+        _wait_until_up(base_url, process)
+
+        files = [(f'sales_{i}.csv', make_csv(args.rows, seed=i)) for i in range(args.distinct_files)]
+        results, sessions_done = [], []  # list.append is thread-safe
+        memory, stop = {}, threading.Event()
+        if process is not None and os.path.isdir('/proc'):
+            threading.Thread(target=_watch_memory, args=(process.pid, memory, stop), daemon=True).start()
+
+        print(f"✅ [load_test] {args.users} virtual users for {args.duration:.0f}s against {base_url}")
+        started = time.time()
+        deadline = started + args.duration
+        threads = []
+        for i in range(args.users):
+            user = VirtualUser(base_url, results, files, args.think_time, args.timeout)
+            thread = threading.Thread(target=_user_loop, args=(user, deadline, sessions_done), daemon=True)
+            thread.start()
+            threads.append(thread)
+            if args.users > 1:
+                time.sleep(args.ramp_up / args.users)
+        for thread in threads:
+            thread.join()  # Sessions already running are finished, so the last ones are complete
+        elapsed = time.time() - started
+        stop.set()
+
+        report = summarize(results, elapsed, len(sessions_done), {str(k): v for k, v in memory.items()})
+        report['config'] = {key: value for key, value in vars(args).items() if key != 'json'}
+        print_report(report)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"✅ [load_test] Report written to {args.json}")
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if log is not None:
+            log.close()
+        if work_dir is not None:
+            if args.keep_workdir:
+                print(f"✅ [load_test] App working folder kept: {work_dir}")
+            else:
+                shutil.rmtree(work_dir, ignore_errors=True)
+        stub.shutdown()
+
+    if args.max_error_rate is not None and report['error_rate'] > args.max_error_rate:
+        print(f"\n!!! Error rate {100 * report['error_rate']:.1f}% is above {100 * args.max_error_rate:.1f}%.")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
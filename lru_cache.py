@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+
+"""
+The small in-memory caches kept per dataset version (frames, catalogs, histograms,
+chart results, ...) all behave the same way:
+- reading an entry marks it as recently used
+- storing one past max_size drops the least recently used entries
+- every call is safe from several threads at once
+LRUCache does this once so each module only says what it caches and how many.
+"""
+
+
+class LRUCache:
+    """A thread-safe mapping that keeps at most max_size entries, dropping the least recently used."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        """Stores a value and returns the keys evicted to make room for it."""
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            evicted = []
+            while len(self._items) > self.max_size:
+                evicted.append(self._items.popitem(last=False)[0])
+            return evicted
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value, or computes and stores it. compute() runs outside the
+        lock, so two threads missing at the same time may both compute; the last one is kept.
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._items.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        return len(self._items)
@@ -1,70 +1,110 @@
 import os
-import pandas as pd
-import uuid
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, send_from_directory
+import importlib.util
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, stream_with_context, g
 from werkzeug.utils import secure_filename
-import chart_generator
-import ai_analyzer
-import ai_chart_generator
-from summary import generate_ai_summary
-from groq import Groq
 from dotenv import load_dotenv
 from flask import Response
-from weasyprint import HTML
+from lazy_imports import lazy_import
+import llm_clients
+import speculation
+import upload_store
 
 load_dotenv()
 
-
-try:
-    groq_api_key = os.environ.get("GROQ_API_KEY")
-    if not groq_api_key:
-        raise ValueError("GROQ_API_KEY not found in .env file.")
-    groq_client = Groq(api_key=groq_api_key)
-    print("✅ [main.py] Groq client initialized successfully.")
-except Exception as e:
-    print(f"!!! [main.py] FAILED to initialize Groq client: {e}")
-    groq_client = None # Set to None if initialization fails
+# --- Heavy modules are imported on first use, so the app (and every worker) starts fast ---
+pd = lazy_import('pandas')
+ai_analyzer = lazy_import('ai_analyzer')
+ai_chart_generator = lazy_import('ai_chart_generator')
+exporter = lazy_import('exporter')
+data_grid = lazy_import('data_grid')
+schema_catalog = lazy_import('schema_catalog')
+chart_query = lazy_import('chart_query')
+insight_engine = lazy_import('insight_engine')
+summary = lazy_import('summary')
+weasyprint = lazy_import('weasyprint')
+
+# Say at startup which AI features will not work, without building any client yet
+for provider in llm_clients.PROVIDERS:
+    if not llm_clients.is_configured(provider):
+        print(f"!!! [main.py] {llm_clients.PROVIDERS[provider]['key_env']} is not set: features using {provider} will return an error.")
 
 # --- App Initialization ---
-app = Flask(__name__)
+# The repo keeps templates and assets in Template/ and Static/, not Flask's default folder names
+app = Flask(__name__, template_folder='Template', static_folder='Static', static_url_path='/static')
 # A secret key is REQUIRED to use sessions in Flask
 app.config['SECRET_KEY'] = 'a_super_secret_key_change_me_for_production' 
 app.config['UPLOAD_FOLDER'] = 'uploads'
+# Warm caches and prefetch AI dashboard suggestions in the background after an upload/append
+app.config['SPECULATIVE_PRECOMPUTE'] = os.environ.get('SPECULATIVE_PRECOMPUTE', 'false').lower() == 'true'
+app.config['SPECULATIVE_WORKERS'] = int(os.environ.get('SPECULATIVE_WORKERS', 1))
+# Raw uploads plus stored datasets are kept under this size; the least recently used are evicted
+app.config['UPLOAD_QUOTA_BYTES'] = int(os.environ.get('UPLOAD_QUOTA_BYTES', 2 * 1024 ** 3))
 ALLOWED_EXTENSIONS = {'csv', 'xls', 'xlsx'}
 
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'])
+dataset_store = lazy_import('dataset_store', on_load=lambda store: store.init_store(os.path.join(app.config['UPLOAD_FOLDER'], 'datasets')))
+upload_store.init_uploads(app.config['UPLOAD_FOLDER'], app.config['UPLOAD_QUOTA_BYTES'])
+speculation.configure(app.config['SPECULATIVE_PRECOMPUTE'], app.config['SPECULATIVE_WORKERS'])
+
+# Background speculation pauses while any real request is being served
+@app.before_request
+def _mark_foreground_request():
+    if request.endpoint != 'static':
+        g.foreground_request = True
+        speculation.foreground_started()
+
+@app.teardown_request
+def _unmark_foreground_request(exc):
+    if g.pop('foreground_request', False):
+        speculation.foreground_finished()
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 # --- Helper Preprocessing Functions ---
 
+# python-calamine (Rust) parses workbooks many times faster than openpyxl.
+# Fall back to openpyxl when it is not installed.
+EXCEL_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') else 'openpyxl'
+
+def list_excel_sheets(source):
+    """Returns the sheet names of a workbook without parsing any of the sheets."""
+    return pd.ExcelFile(source, engine=EXCEL_ENGINE).sheet_names
+
+def read_uploaded_file(source, filename, sheet_name=None):
+    """Parses an uploaded .csv or .xlsx file (a path or a file-like object) into a DataFrame."""
+    if filename.lower().endswith('.csv'):
+        return pd.read_csv(source)
+    return pd.read_excel(source, sheet_name=sheet_name or 0, engine=EXCEL_ENGINE)
+
+def current_catalog():
+    """Returns the schema catalog of the current dataset, or None if nothing is loaded."""
+    dataset_id = session.get('current_dataset_id')
+    if not dataset_store.dataset_exists(dataset_id):
+        return None
+    return schema_catalog.get_catalog(dataset_id)
+
 def load_dataframe():
-    """Loads the current dataframe from session and performs initial type conversion."""
-    if 'current_filename' not in session:
+    """Loads the current dataframe from the dataset store and performs initial type conversion."""
+    if 'current_dataset_id' not in session:
         return None
     
-    current_filename = session.get('current_filename')
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], current_filename)
-    
     try:
-        # --- THIS IS THE CORRECTED LINE ---
-        # We now explicitly tell Pandas to use the 'openpyxl' engine for Excel files.
-        df = pd.read_csv(filepath) if current_filename.endswith('.csv') else pd.read_excel(filepath, engine='openpyxl')
+        df = dataset_store.load_dataset(session['current_dataset_id'])
         
-        df.columns = [col.strip() for col in df.columns]
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                try:
-                    df[col] = pd.to_datetime(df[col], errors='coerce').fillna(df[col])
-                except Exception:
-                    continue
-        return df
+        # The catalog already knows which text columns hold dates, so only those are parsed
+        return schema_catalog.apply_catalog_types(df, schema_catalog.get_catalog(session['current_dataset_id']))
     except Exception as e:
         flash(f"Error reading file: {e}", "danger")
         return None
 
+def load_sample_dataframe():
+    """Loads the random sample of the current dataset. Returns (sample, total_rows)."""
+    sample, total_rows = dataset_store.load_sample(session['current_dataset_id'])
+    catalog = schema_catalog.get_catalog(session['current_dataset_id'])
+    return schema_catalog.apply_catalog_types(sample.copy(), catalog), total_rows
+
 def handle_missing_values(df):
     """Fills missing numerical values with the mean."""
     for col in df.select_dtypes(include=['number']).columns:
@@ -123,26 +163,23 @@ def handle_outliers_iqr(df):
 
 def get_dataframe_from_session():
     """
-    Loads the DataFrame from the ORIGINAL uploaded file path.
-    It handles both .csv and .xlsx files.
+    Loads the DataFrame of the ORIGINAL uploaded dataset (including any appended data)
+    from the dataset store.
     """
     print("\n--- [get_dataframe_from_session] ---")
     print(f"DEBUG: Current Session Contents: {dict(session)}")
 
-    raw_path = session.get('filepath')
+    dataset_id = session.get('dataset_id')
     
-    if raw_path and os.path.exists(raw_path):
-        print(f"SUCCESS: Found raw file path: {raw_path}")
+    if dataset_store.dataset_exists(dataset_id):
+        print(f"SUCCESS: Found dataset: {dataset_id}")
         try:
-            if raw_path.endswith('.xlsx'):
-                return pd.read_excel(raw_path)
-            else: # Assume CSV for everything else
-                return pd.read_csv(raw_path)
+            return dataset_store.load_dataset(dataset_id)
         except Exception as e:
-            print(f"ERROR: Failed to read file {raw_path}. Reason: {e}")
+            print(f"ERROR: Failed to load dataset {dataset_id}. Reason: {e}")
             return None
             
-    print("FAILURE: No valid 'filepath' key found in session or file does not exist.")
+    print("FAILURE: No valid 'dataset_id' key found in session or dataset does not exist.")
     return None
 
 @app.route('/')
@@ -174,60 +211,160 @@ def upload_file():
         if not allowed_file(file.filename):
             return jsonify({'error': 'File type not allowed. Please use .csv or .xlsx'}), 400
         
-        # --- This logic is great for creating a unique filename ---
+        # The file is hashed while it is saved and stored under its content hash,
+        # so uploading the same file twice keeps one copy and reuses its dataset.
         original_filename = secure_filename(file.filename)
-        unique_prefix = uuid.uuid4().hex[:8]
-        new_filename = f"{unique_prefix}_{original_filename}"
-        
-        # Construct the full path to the file
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], new_filename)
-        
-        # Save the file to the server's disk
-        file.save(filepath)
-        
-        # --- THIS IS THE CRITICAL FIX ---
-        # We store the FULL PATH in the session key 'filepath'.
-        # This is the key that the rest of your application (like get_dataframe_from_session)
-        # is looking for.
-        session['filepath'] = filepath
-        
-        session['current_filename'] = new_filename
-        
-        # Clear any old processed file paths from previous sessions
-        session.pop('processed_filepath', None)
-        
-        print("\n--- UPLOAD SUCCESS ---")
-        print(f"Saved file to: {filepath}")
-        print(f"✅ Set session['filepath'] = {session.get('filepath')}")
-        print(f"✅ Set session['current_filename'] = {session.get('current_filename')}") # For debugging
-        print("---------------------\n")
-
-        # Your frontend JavaScript will use this redirect URL
-        return jsonify({'redirect': url_for('process_data')})
+        upload_id, content_hash = upload_store.save_upload(file.stream, original_filename.rsplit('.', 1)[1])
+        new_filename = f"{content_hash[:8]}_{original_filename}"
+        filepath = upload_store.raw_path(upload_id)
+
+        # Workbooks with several sheets: ask the user which one to use first
+        sheet_name = request.form.get('sheet_name')
+        if new_filename.lower().endswith('.xlsx') and not sheet_name:
+            try:
+                sheets = list_excel_sheets(filepath)
+            except Exception as e:
+                return jsonify({'error': f'Could not read the uploaded file: {e}'}), 400
+            if len(sheets) > 1:
+                session['pending_upload'] = {'upload_id': upload_id, 'filename': new_filename}
+                return jsonify({'sheets': sheets, 'upload_id': upload_id})
+
+        return register_upload(filepath, new_filename, content_hash, sheet_name)
     
     # This handles the GET request to show the upload page
     return render_template('upload.html')
 
+@app.route('/upload/select-sheet', methods=['POST'])
+def select_upload_sheet():
+    """Finishes an Excel upload once the user has picked the sheet to import."""
+    payload = request.get_json() or {}
+    upload_id, sheet_name = payload.get('upload_id'), payload.get('sheet_name')
+    pending = session.get('pending_upload') or {}
+    if not upload_id or upload_id != pending.get('upload_id') or not sheet_name:
+        return jsonify({'error': 'No pending upload found. Please upload the file again.'}), 400
+
+    filepath = upload_store.raw_path(upload_id)
+    if not os.path.exists(filepath):
+        return jsonify({'error': 'The uploaded file is no longer available. Please upload it again.'}), 400
+    session.pop('pending_upload', None)
+    return register_upload(filepath, pending['filename'], upload_id.split('.', 1)[0], sheet_name)
+
+def register_upload(filepath, new_filename, content_hash, sheet_name=None):
+    """
+    Parses a saved upload ONCE and converts it into the dataset store.
+    Every later request reads the stored copy, so Excel files cost the same as CSV ones.
+    The dataset id comes from the file's content: if the same file (and sheet) was
+    uploaded before, its stored dataset and everything cached for it are reused as is.
+    """
+    dataset_id = upload_store.content_dataset_id(content_hash, sheet_name)
+    if dataset_store.dataset_exists(dataset_id):
+        print(f"♻️ [main.py] Same file uploaded before, reusing dataset {dataset_id}.")
+    else:
+        try:
+            df = read_uploaded_file(filepath, new_filename, sheet_name)
+        except Exception as e:
+            return jsonify({'error': f'Could not read the uploaded file: {e}'}), 400
+        # Shared by every session uploading this file, so it is never changed (see append_data)
+        dataset_store.create_dataset(df, source_name=new_filename, dataset_id=dataset_id, shared=True)
+
+    # The previous upload is no longer worth warming, unless other sessions may be using it
+    previous_id = session.get('dataset_id')
+    if previous_id != dataset_id and dataset_store.dataset_exists(previous_id) \
+            and not dataset_store.get_meta(previous_id).get('shared'):
+        speculation.cancel(previous_id)
+    speculation.schedule(dataset_id)
+    
+    # --- THIS IS THE CRITICAL FIX ---
+    # We store the FULL PATH in the session key 'filepath'.
+    # This is the key that the rest of your application (like get_dataframe_from_session)
+    # is looking for.
+    session['filepath'] = filepath
+    
+    session['current_filename'] = new_filename
+    session['dataset_id'] = dataset_id
+    session['current_dataset_id'] = dataset_id
+    
+    # Clear any old processed file paths from previous sessions
+    session.pop('processed_filepath', None)
+    
+    print("\n--- UPLOAD SUCCESS ---")
+    print(f"Saved file to: {filepath}" + (f" (sheet '{sheet_name}')" if sheet_name else ""))
+    print(f"✅ Set session['filepath'] = {session.get('filepath')}")
+    print(f"✅ Set session['current_filename'] = {session.get('current_filename')}") # For debugging
+    print(f"✅ Set session['dataset_id'] = {session.get('dataset_id')}")
+    print("---------------------\n")
+
+    upload_store.enforce_quota(protect={dataset_id, filepath})
+
+    # Your frontend JavaScript will use this redirect URL
+    return jsonify({'redirect': url_for('process_data')})
+
+@app.route('/api/append-data', methods=['POST'])
+def append_data():
+    """
+    Appends a new chunk of rows (e.g. a daily drop) to an existing dataset.
+    The chunk must have the same columns as the stored dataset.
+    """
+    dataset_id = session.get('dataset_id')  # Only the dataset this session uploaded
+    if not dataset_store.dataset_exists(dataset_id):
+        return jsonify({'error': 'No dataset found to append to. Please upload a file first.'}), 400
+
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+
+    file = request.files['file']
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'File type not allowed. Please use .csv or .xlsx'}), 400
+
+    skip_duplicates = request.form.get('skip_duplicates', 'true').lower() != 'false'
+
+    try:
+        chunk = read_uploaded_file(file.stream, secure_filename(file.filename), request.form.get('sheet_name'))
+    except Exception as e:
+        return jsonify({'error': f'Could not read the uploaded file: {e}'}), 400
+
+    # Other sessions may use the uploaded dataset, so the first append works on a private copy
+    if dataset_store.get_meta(dataset_id).get('shared'):
+        dataset_id = dataset_store.fork_dataset(dataset_id)
+        session['dataset_id'] = dataset_id
+
+    try:
+        report = dataset_store.append_rows(dataset_id, chunk, skip_duplicates=skip_duplicates)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Histograms and the other caches are rebuilt in the background (or on first use), so
+    # the request only costs as much as the new rows
+    speculation.schedule(dataset_id)  # Replaces any job still warming the previous version
+    upload_store.enforce_quota(protect={dataset_id, session.get('filepath')})
+
+    # Processed versions were built from the old rows, so start again from the full dataset
+    if dataset_id == session.get('dataset_id'):
+        source_name = dataset_store.get_meta(dataset_id)['source_name']
+        session['current_dataset_id'] = dataset_id
+        session['current_filename'] = f"v{report['version']}_{source_name}"
+
+    return jsonify(report)
+
 @app.route('/process', methods=['GET', 'POST'])
 def process_data():
-    if 'current_filename' not in session:
+    if 'current_dataset_id' not in session:
         flash("Please upload a file first.", "warning")
         return redirect(url_for('upload_file'))
 
     current_filename = session.get('current_filename')
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], current_filename)
     
     try:
-        df = pd.read_csv(filepath) if current_filename.endswith('.csv') else pd.read_excel(filepath)
+        meta = dataset_store.get_meta(session['current_dataset_id'])
     except Exception as e:
         flash(f"Error reading file: {e}", "danger")
-        session.pop('current_filename', None) # Clear bad file from session
+        session.pop('current_dataset_id', None) # Clear bad dataset from session
         return redirect(url_for('upload_file'))
 
-    # Get column names for the feature selection form
-    column_names = df.columns.tolist()
+    # Get column names for the feature selection form (from the stored schema, no data is read)
+    column_names = [column['name'] for column in meta['schema']]
 
     if request.method == 'POST':
+        df = dataset_store.load_dataset(session['current_dataset_id'])
         step = request.form.get('processing_step')
         new_filename = None # Initialize new filename
 
@@ -253,76 +390,114 @@ def process_data():
                 df = func(df)
                 new_filename = prefix + current_filename
         
-        # --- Save the modified file and update the session ---
+        # --- Store the modified data and update the session ---
+        # Nothing is exported here; files are only generated when the user downloads.
         if new_filename:
-            new_filepath = os.path.join(app.config['UPLOAD_FOLDER'], new_filename)
-            if new_filename.endswith('.csv'):
-                df.to_csv(new_filepath, index=False)
-            else:
-                df.to_excel(new_filepath, index=False)
-            
-            # Optionally, remove the old file to save space
-            # os.remove(filepath) 
-
             session['current_filename'] = new_filename
+            session['current_dataset_id'] = dataset_store.create_dataset(df, source_name=new_filename)
+            upload_store.enforce_quota(protect={session['current_dataset_id'], session.get('dataset_id'), session.get('filepath')})
             return redirect(url_for('process_data'))
 
-    # For a GET request, display the page with data preview and column names
-    data_preview = df.head().to_html(classes='table table-striped', justify='left')
+    # For a GET request, display the page with column names. The data grid loads its rows from /api/data-grid.
     return render_template('process.html', 
                            current_file=current_filename, 
-                           data_preview=data_preview,
+                           total_rows=meta['row_count'],
                            column_names=column_names)
 
+@app.route('/api/data-grid', methods=['POST'])
+def api_data_grid():
+    """
+    Returns one page of the current dataset for the data grid, with server-side sort and filters.
+    Payload: {offset, limit, sort: {column, descending}, filters: [{column, op, value}], include_stats}
+    """
+    dataset_id = session.get('current_dataset_id')
+    if not dataset_store.dataset_exists(dataset_id):
+        return jsonify({'error': 'No file found in session. Please upload a file again.'}), 400
+
+    payload = request.get_json() or {}
+    try:
+        page = data_grid.get_page(
+            dataset_id,
+            offset=payload.get('offset', 0),
+            limit=payload.get('limit', 100),
+            sort=payload.get('sort'),
+            filters=payload.get('filters'),
+            include_stats=payload.get('include_stats', False)
+        )
+        return jsonify(page)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/download/<filename>')
 def download_file(filename):
+    """
+    Exports the current version of the data on demand and streams it to the client.
+    Query parameters: format=csv|xlsx|parquet and gzip=1 for a compressed download.
+    """
     if 'current_filename' not in session or filename != session['current_filename']:
         flash("Invalid download request.", "danger")
         return redirect(url_for('process_data'))
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
+
+    export_format = request.args.get('format', 'csv').lower()
+    use_gzip = request.args.get('gzip', '0').lower() in ('1', 'true', 'on')
+    if export_format not in exporter.EXPORT_FORMATS:
+        flash(f"Unsupported download format: {export_format}", "danger")
+        return redirect(url_for('process_data'))
+
+    try:
+        chunks = exporter.stream_export(session['current_dataset_id'], export_format, use_gzip)
+    except ValueError as e:
+        # Checked before the response starts, so the user gets a message instead of a cut-off file
+        flash(str(e), "danger")
+        return redirect(url_for('process_data'))
+    download_name = exporter.export_filename(filename, export_format, use_gzip)
+    mimetype = 'application/gzip' if use_gzip else exporter.EXPORT_FORMATS[export_format]['mimetype']
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment;filename={download_name}'}
+    )
 
 @app.route('/custom-chart')
 def custom_chart():
     """Renders the custom chart building page."""
-    df = load_dataframe()
-    if df is None:
+    catalog = current_catalog()
+    if catalog is None:
         flash("Please upload and process a file first.", "warning")
         return redirect(url_for('upload_file'))
 
-    columns = df.columns.tolist()
-    numeric_columns = df.select_dtypes(include=['number']).columns.tolist()
-    categorical_columns = df.select_dtypes(include=['object', 'category', 'datetime64[ns]']).columns.tolist()
-
     return render_template('custom_chart.html', 
-                           columns=columns, 
-                           numeric_columns=numeric_columns,
-                           categorical_columns=categorical_columns)
+                           columns=catalog['columns'], 
+                           numeric_columns=catalog['numeric_columns'],
+                           categorical_columns=catalog['categorical_columns'])
 
 @app.route('/api/generate-chart', methods=['POST'])
 def api_generate_chart():
-    df = load_dataframe()
-    if df is None:
+    catalog = current_catalog()
+    if catalog is None:
         return jsonify({'error': 'No file found in session. Please upload a file again.'}), 400
 
     payload = request.json
     print(f"[DEBUG] Received payload in /api/generate-chart: {payload}")
 
-    # --- THIS IS THE CORRECTED LOGIC ---
-    # It now understands the keys from dashboard.js (x_axis, category)
-    # AND the keys from ai_chart.js (x_column, y_column).
-    chart_options = {
-        'chartType': payload.get('chartType'),
-        'x_column': payload.get('x_axis') or payload.get('category') or payload.get('column') or payload.get('x_column'),
-        'y_column': payload.get('y_axis') or payload.get('values') or payload.get('y_column')
-    }
-    
-    # We now pass the entire flexible payload to the generator
-    # This handles extra options like agg_func, bins, showLine, etc.
-    final_options = {**payload, **chart_options}
+    # The chart query engine understands the keys from dashboard.js (x_axis, category, agg_func, bins)
+    # AND the keys from the AI pages (x_column, y_column), plus declarative keys like
+    # 'measures' (several series in one query), 'filters', 'sort', 'limit' and 'granularity'.
+    # With 'approximate': true the chart is estimated from the dataset's random sample; the
+    # front end then asks again without it and swaps in the exact chart when it arrives.
+    spec = chart_query.spec_from_options(payload)
 
     try:
-        # Use your ai_chart_generator as it has the robust data generation logic
-        chart_data = ai_chart_generator.generate_chart_data(df, final_options)
+        # Same chart on the same dataset version: answer from the cache without loading the data
+        chart_data = chart_query.get_cached_result(spec, catalog)
+        if chart_data is None and spec['approximate']:
+            sample, total_rows = load_sample_dataframe()
+            chart_data = chart_query.run_query(sample, spec, catalog=catalog, population_rows=total_rows)
+        elif chart_data is None:
+            df = load_dataframe()
+            if df is None:
+                return jsonify({'error': 'No file found in session. Please upload a file again.'}), 400
+            chart_data = chart_query.run_query(df, spec, catalog=catalog)
         
         if chart_data.get('error'):
              print(f"[ERROR] Chart generation failed: {chart_data.get('error')}")
@@ -358,8 +533,7 @@ def analyze_chart():
     
 @app.route('/ai-chart')
 def ai_chart():
-    df = load_dataframe()
-    if df is None:
+    if current_catalog() is None:
         flash("Please upload a file first before using the AI Chart feature.", "warning")
         return redirect(url_for('upload_file'))
     
@@ -369,19 +543,19 @@ def ai_chart():
 @app.route('/api/get-ai-chart-config', methods=['POST'])
 def api_get_ai_chart_config():
     prompt = request.json.get('prompt')
-    df = load_dataframe()
-    if df is None or not prompt: return jsonify({'error': 'Missing data or prompt.'}), 400
+    catalog = current_catalog()
+    if catalog is None or not prompt: return jsonify({'error': 'Missing data or prompt.'}), 400
     try:
-        chart_config = ai_chart_generator.get_chart_config_from_prompt(prompt, df)
+        chart_config = ai_chart_generator.get_chart_config_from_prompt(prompt, catalog)
         return jsonify(chart_config)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 @app.route('/api/get-ai-dashboard-configs', methods=['POST'])
 def api_get_ai_dashboard_configs():
-    df = load_dataframe()
-    if df is None: return jsonify({'error': 'Missing data.'}), 400
+    catalog = current_catalog()
+    if catalog is None: return jsonify({'error': 'Missing data.'}), 400
     try:
-        configs = ai_chart_generator.get_dashboard_configs_from_data(df)
+        configs = ai_chart_generator.get_dashboard_configs_from_data(catalog)
         return jsonify(configs)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -457,32 +631,43 @@ def apply_preprocessing():
 def generate_full_summary_api():
     """
     API endpoint that uses the summary module to generate a data summary.
-    This version includes a safety check to handle cases where no data is loaded.
+    The findings are computed locally over the whole uploaded dataset (cached per version);
+    the AI only phrases them. Without an AI key the findings are returned as plain markdown.
     """
-    # First, attempt to get the dataframe from the session
-    df = get_dataframe_from_session()
-    
-    # --- THIS IS THE CRUCIAL FIX ---
-    # Check if the dataframe is None RIGHT AFTER you get it.
-    # If it's None, stop immediately and return a clean JSON error.
-    if df is None:
+    dataset_id = session.get('dataset_id')
+    if not dataset_store.dataset_exists(dataset_id):
         return jsonify({'error': 'No data file found. Please upload and process a file first.'}), 400
 
     # We wrap the rest in a try...except block for robust error handling
     try:
-        # Now it is safe to call the summary function, because we know df is not None.
-        # This function is imported from your summary.py file.
-        summary_text = generate_ai_summary(df, groq_client)
+        catalog = schema_catalog.get_catalog(dataset_id)
+        findings = insight_engine.get_insights(dataset_id)
+        if not llm_clients.is_configured('groq'):
+            return jsonify({'summary': insight_engine.findings_to_markdown(findings, catalog), 'phrased_by_ai': False})
+
+        summary_text = summary.generate_ai_summary(catalog, findings, llm_clients.get_client('groq'))
         
         # If successful, return the summary in a JSON format
-        return jsonify({'summary': summary_text})
+        return jsonify({'summary': summary_text, 'phrased_by_ai': True})
 
+    except ConnectionError as e:
+        # The AI provider is not configured (e.g. GROQ_API_KEY missing)
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         # If any other error happens during the AI call, catch it
         print(f"Error in /api/generate-full-summary route: {e}")
         # Return a generic error message to the user
         return jsonify({'error': 'An internal error occurred while generating the summary.'}), 500
     
+@app.route('/api/insights', methods=['GET'])
+def api_insights():
+    """Returns the ranked findings (trends, correlations, top contributors, ...) for the current dataset."""
+    dataset_id = session.get('current_dataset_id')
+    if not dataset_store.dataset_exists(dataset_id):
+        return jsonify({'error': 'No file found in session. Please upload a file again.'}), 400
+    findings = insight_engine.get_insights(dataset_id)
+    return jsonify({'dataset_id': dataset_id, 'version': dataset_store.get_version(dataset_id), 'findings': findings})
+
 # In main.py
 
 @app.route('/api/download-summary-pdf', methods=['POST'])
@@ -516,7 +701,7 @@ def download_summary_pdf():
         full_html = f"<html><head>{pdf_style}</head><body><h1>AI Data Summary</h1>{html_content}</body></html>"
 
         # --- Use WeasyPrint to generate the PDF ---
-        pdf_bytes = HTML(string=full_html).write_pdf()
+        pdf_bytes = weasyprint.HTML(string=full_html).write_pdf()
 
         # --- DEBUG CHECK #2: See what WeasyPrint produced ---
         print("2. WeasyPrint output check:")
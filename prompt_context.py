@@ -0,0 +1,152 @@
+import os
+import re
+import difflib
+
+import pandas as pd
+
+import dataset_store
+from lru_cache import LRUCache
+
+"""
+Compact schema descriptions for LLM prompts.
+Instead of pasting sample rows or every column name into a prompt, each column is
+described in one short line (type, role, key statistics, a few typical values).
+Columns are ranked by relevance to the user's request and added until a hard
+token budget is reached. Column descriptors are built once per dataset version.
+"""
+
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', 1200))
+CHARS_PER_TOKEN = 4        # Rough estimate, good enough for budgeting
+DESCRIBED_SHARE = 0.75     # Share of the budget for full descriptors; the rest lists other column names
+TOP_VALUES = 3
+MAX_VALUE_CHARS = 24
+MAX_CACHED_DESCRIPTORS = 16
+
+_descriptor_cache = LRUCache(MAX_CACHED_DESCRIPTORS)  # (dataset_id, version) -> {column: descriptor line}
+
+# How useful a column usually is for a chart when the prompt does not mention it
+_ROLE_PRIOR = {'time': 3.0, 'measure': 2.5, 'dimension': 2.0, 'id': 0.5}
+_STOP_WORDS = {'the', 'a', 'an', 'of', 'by', 'for', 'and', 'or', 'in', 'on', 'per', 'to', 'with', 'show', 'me', 'chart', 'plot', 'graph', 'vs', 'over'}
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _words(text):
+    """Lowercase words, with camelCase split: 'totalSales' -> {'total', 'sales'}."""
+    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', str(text))
+    return {w for w in re.findall(r'[a-z0-9]+', text.lower()) if w not in _STOP_WORDS}
+
+
+def _short(value):
+    text = str(value)
+    return text if len(text) <= MAX_VALUE_CHARS else text[:MAX_VALUE_CHARS - 1] + '…'
+
+
+def _number(value):
+    return f'{value:.4g}' if isinstance(value, float) else str(value)
+
+
+def _describe_column(info, stats, sample, row_count):
+    """One line per column, e.g. "- sales: numeric measure; 1.2..980; mean 101; 2% null"."""
+    parts = [f"{info['kind']} {info['role']}" if info['kind'] != 'datetime' else 'date']
+    if info['kind'] == 'numeric' and stats.get('min') is not None:
+        parts.append(f"{_number(stats['min'])}..{_number(stats['max'])}")
+        if stats.get('count'):
+            parts.append(f"mean {_number(stats['sum'] / stats['count'])}")
+    elif info['kind'] == 'datetime' and sample is not None:
+        dates = pd.to_datetime(sample[info['name']], errors='coerce').dropna()
+        if len(dates):
+            parts.append(f"{dates.min().date()}..{dates.max().date()}")
+    else:
+        parts.append(f"{info['cardinality']} distinct")
+        if info['role'] != 'id':
+            # Most frequent values in the random sample, which are more typical than the first rows
+            values = sample[info['name']].value_counts().head(TOP_VALUES).index if sample is not None else info['sample_values'][:TOP_VALUES]
+            if len(values):
+                parts.append('e.g. ' + ', '.join(_short(v) for v in values))
+    if info['null_count'] and row_count:
+        parts.append(f"{100 * info['null_count'] / row_count:.0f}% null")
+    return f"- {info['name']}: " + '; '.join(parts)
+
+
+def _build_descriptors(catalog):
+    dataset_id = catalog.get('dataset_id')
+    profile, sample = {}, None
+    if dataset_id is not None:
+        profile = dataset_store.get_profile(dataset_id)
+        sample, _ = dataset_store.load_sample(dataset_id)
+    return {
+        col: _describe_column(catalog['by_name'][col], profile.get(col, {}), sample, catalog['row_count'])
+        for col in catalog['columns']
+    }
+
+
+def get_descriptors(catalog):
+    """Column descriptor lines for a catalog, cached per dataset version."""
+    key = (catalog.get('dataset_id'), catalog.get('version'))
+    if key[0] is None:
+        return _build_descriptors(catalog)
+    return _descriptor_cache.get_or_compute(key, lambda: _build_descriptors(catalog))
+
+
+def rank_columns(catalog, user_prompt=None):
+    """Columns ordered by relevance to the prompt (or by general usefulness without one)."""
+    prompt_words = _words(user_prompt or '')
+    prompt_normalized = re.sub(r'[^a-z0-9]', '', (user_prompt or '').lower())
+    scores = {}
+    for position, col in enumerate(catalog['columns']):
+        info = catalog['by_name'][col]
+        column_words = _words(col)
+        score = _ROLE_PRIOR.get(info['role'], 1.0)
+        if info['role'] == 'dimension' and 2 <= info['cardinality'] <= 50:
+            score += 0.5  # Few distinct values make good categories
+        score -= info['null_count'] / max(catalog['row_count'], 1)
+        if prompt_words:
+            score += 10 * len(column_words & prompt_words)
+            if len(info['normalized']) > 2 and info['normalized'] in prompt_normalized:
+                score += 10
+            # Near matches such as 'sale' / 'sales' or 'revenu' / 'revenue'
+            score += 5 * sum(
+                1 for w in column_words - prompt_words if len(w) > 3
+                and difflib.get_close_matches(w, prompt_words, n=1, cutoff=0.85)
+            )
+        scores[col] = (-score, position)
+    return sorted(catalog['columns'], key=scores.get)
+
+
+def build_prompt_context(catalog, user_prompt=None, token_budget=PROMPT_TOKEN_BUDGET):
+    """
+    Describes the dataset for an LLM prompt in at most token_budget (estimated) tokens.
+    The most relevant columns get a full descriptor line; the rest are listed by
+    name while they fit, and the remainder is only counted.
+    """
+    descriptors = get_descriptors(catalog)
+    ranked = rank_columns(catalog, user_prompt)
+    header = f"Dataset: {catalog['row_count']} rows, {len(ranked)} columns. Columns (name: type; stats; typical values):"
+    lines, used = [header], estimate_tokens(header)
+
+    described = 0
+    for col in ranked:
+        cost = estimate_tokens(descriptors[col]) + 1
+        if used + cost > token_budget * DESCRIBED_SHARE:
+            break
+        lines.append(descriptors[col])
+        used += cost
+        described += 1
+
+    remaining = ranked[described:]
+    if remaining:
+        names, prefix = [], 'Other columns: '
+        used += estimate_tokens(prefix) + 8  # Room for the "(+N more)" note
+        for col in remaining:
+            cost = estimate_tokens(col) + 1
+            if used + cost > token_budget:
+                break
+            names.append(col)
+            used += cost
+        omitted = len(remaining) - len(names)
+        if names or omitted:
+            lines.append(prefix + ', '.join(names) + (f' (+{omitted} more)' if omitted else ''))
+    return '\n'.join(lines)
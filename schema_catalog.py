@@ -0,0 +1,162 @@
+import re
+import difflib
+import warnings
+
+import pandas as pd
+
+import dataset_store
+from lru_cache import LRUCache
+
+"""
+Schema catalog: all the column metadata the app needs, built ONCE per dataset version.
+- dtypes and a simple kind (numeric, datetime, boolean, categorical)
+- a semantic role for each column (measure, dimension, time, id)
+- normalized and token keys used to match column names suggested by users or the AI
+- cardinality, null counts and a few sample values
+Routes and chart modules read from the catalog instead of inspecting the DataFrame.
+"""
+
+MAX_CACHED_CATALOGS = 16
+SAMPLE_VALUES = 5
+FUZZY_CUTOFF = 0.8
+
+_catalog_cache = LRUCache(MAX_CACHED_CATALOGS)  # (dataset_id, version) -> catalog dict
+
+_ID_NAME_PATTERN = re.compile(r'(^|[^a-z])(id|uuid|key|code)$|^id[^a-z]', re.IGNORECASE)
+
+
+def normalize_name(name):
+    """The normalization used everywhere to compare column names (lowercase, alphanumerics only)."""
+    return re.sub(r'[^a-z0-9]', '', str(name).lower())
+
+
+def _token_key(name):
+    """Order-independent key, so 'Sales Amount' matches 'amount_sales'."""
+    return ''.join(sorted(re.findall(r'[a-z0-9]+', str(name).lower())))
+
+
+def _parses_as_datetime(series):
+    """True if every non-null value of a text column can be read as a date."""
+    non_null = series.dropna()
+    if non_null.empty or pd.api.types.is_numeric_dtype(non_null.infer_objects()):
+        return False
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        # Cheap check on a few values first, then confirm on the whole column
+        if pd.to_datetime(non_null.head(50), errors='coerce').isna().any():
+            return False
+        return not pd.to_datetime(non_null, errors='coerce').isna().any()
+
+
+def _column_kind(series, parse_as_datetime):
+    if pd.api.types.is_bool_dtype(series):
+        return 'boolean'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'numeric'
+    if pd.api.types.is_datetime64_any_dtype(series) or parse_as_datetime:
+        return 'datetime'
+    return 'categorical'
+
+
+def _column_role(name, kind, cardinality, row_count):
+    if kind == 'datetime':
+        return 'time'
+    mostly_unique = row_count > 20 and cardinality >= 0.95 * row_count
+    if _ID_NAME_PATTERN.search(str(name)):
+        # 'customer_id' repeating across rows is something to group by, not a row id
+        return 'id' if mostly_unique else 'dimension'
+    if kind == 'numeric':
+        return 'measure'
+    if kind == 'categorical' and mostly_unique:
+        return 'id'
+    return 'dimension'
+
+
+def build_catalog(df, dataset_id=None, version=None):
+    """Builds the catalog for a DataFrame. Prefer get_catalog(), which caches the result."""
+    row_count = len(df)
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        parse_as_datetime = series.dtype == 'object' and _parses_as_datetime(series)
+        kind = _column_kind(series, parse_as_datetime)
+        cardinality = int(series.nunique(dropna=True))
+        samples = series.dropna().drop_duplicates().head(SAMPLE_VALUES)
+        columns[col] = {
+            'name': col,
+            'dtype': 'datetime64[ns]' if parse_as_datetime else str(series.dtype),
+            'kind': kind,
+            'role': _column_role(col, kind, cardinality, row_count),
+            'normalized': normalize_name(col),
+            'token_key': _token_key(col),
+            'cardinality': cardinality,
+            'null_count': int(series.isna().sum()),
+            'sample_values': [str(v) for v in samples],
+            'parse_as_datetime': bool(parse_as_datetime),
+        }
+
+    names = list(df.columns)
+    catalog = {
+        'dataset_id': dataset_id,
+        'version': version,
+        'row_count': int(row_count),
+        'columns': names,
+        'by_name': columns,
+        'normalized': {info['normalized']: name for name, info in columns.items()},
+        'token_keys': {info['token_key']: name for name, info in columns.items()},
+        'numeric_columns': [c for c in names if columns[c]['kind'] == 'numeric'],
+        'datetime_columns': [c for c in names if columns[c]['kind'] == 'datetime'],
+        'categorical_columns': [c for c in names if columns[c]['kind'] in ('categorical', 'datetime')],
+        'roles': {role: [c for c in names if columns[c]['role'] == role] for role in ('measure', 'dimension', 'time', 'id')},
+    }
+    return catalog
+
+
+def get_catalog(dataset_id):
+    """Returns the cached catalog for the current version of a stored dataset."""
+    version = dataset_store.get_version(dataset_id)
+    key = (dataset_id, version)
+    catalog = _catalog_cache.get(key)
+    if catalog is not None:
+        return catalog
+
+    # Saved next to the dataset, so a restart or a re-upload of the same file does not rebuild it
+    catalog = dataset_store.load_artifact(dataset_id, version, 'catalog')
+    if catalog is None:
+        catalog = build_catalog(dataset_store.load_dataset(dataset_id, copy=False), dataset_id, version)
+        dataset_store.save_artifact(dataset_id, version, 'catalog', catalog)
+    _catalog_cache.put(key, catalog)
+    print(f"✅ [schema_catalog] Built catalog for {dataset_id} v{version} ({len(catalog['columns'])} columns).")
+    return catalog
+
+
+def resolve_column(catalog, suggestion):
+    """
+    Maps a column name suggested by a user or the AI to an actual column.
+    Tries an exact match, then the normalized key, the token key and finally a fuzzy match.
+    Returns None if nothing is close enough.
+    """
+    if suggestion is None:
+        return None
+    if suggestion in catalog['by_name']:
+        return suggestion
+    normalized = normalize_name(suggestion)
+    if normalized in catalog['normalized']:
+        return catalog['normalized'][normalized]
+    token_key = _token_key(suggestion)
+    if token_key in catalog['token_keys']:
+        return catalog['token_keys'][token_key]
+    close = difflib.get_close_matches(normalized, list(catalog['normalized']), n=1, cutoff=FUZZY_CUTOFF)
+    return catalog['normalized'][close[0]] if close else None
+
+
+def apply_catalog_types(df, catalog):
+    """Parses the text columns the catalog knows to hold dates (df is changed in place)."""
+    for col in df.columns:
+        if catalog['by_name'][col]['parse_as_datetime']:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
+
+
+def is_numeric(catalog, column):
+    return catalog['by_name'].get(column, {}).get('kind') == 'numeric'
@@ -0,0 +1,146 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lazy_imports import lazy_import
+
+dataset_store = lazy_import('dataset_store')
+schema_catalog = lazy_import('schema_catalog')
+histograms = lazy_import('histograms')
+prompt_context = lazy_import('prompt_context')
+insight_engine = lazy_import('insight_engine')
+chart_query = lazy_import('chart_query')
+ai_chart_generator = lazy_import('ai_chart_generator')
+
+"""
+Speculative precomputation right after an upload or an append.
+While the user is still reading the processing page, a small background pool warms
+everything the next pages need for the new dataset version:
+  frame cache -> random sample -> schema catalog -> histograms -> prompt context -> insights
+  -> AI dashboard suggestions -> chart data for each suggestion.
+- Jobs are cancelled when the dataset changes (new version, new upload).
+- The pool is small and every step waits until no foreground request is running,
+  so speculation never competes with what the user is actually waiting for.
+It is off unless enabled with configure() (see SPECULATIVE_PRECOMPUTE in main.py).
+"""
+
+IDLE_POLL_SECONDS = 0.05
+MAX_IDLE_WAIT_SECONDS = 30   # Give up on a step if the server never becomes idle
+
+_enabled = False
+_executor = None
+_lock = threading.Lock()
+_tokens = {}                 # dataset_id -> (version, Event set when that dataset's job must stop)
+_active_requests = 0
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def configure(enabled, max_workers=1):
+    """Turns speculation on or off. max_workers caps how many jobs run at the same time."""
+    global _enabled, _executor
+    _enabled = bool(enabled)
+    if _enabled and _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(int(max_workers), 1), thread_name_prefix='speculate')
+    print(f"✅ [speculation] Speculative precompute {'enabled' if _enabled else 'disabled'}.")
+
+
+# --- Foreground request tracking ---
+
+def foreground_started():
+    global _active_requests
+    with _lock:
+        _active_requests += 1
+
+
+def foreground_finished():
+    global _active_requests
+    with _lock:
+        _active_requests = max(_active_requests - 1, 0)
+
+
+def _checkpoint(dataset_id, version, token):
+    """Stops the job if it was cancelled or the dataset moved on, and waits while foreground requests run."""
+    waited = 0.0
+    while _active_requests and waited < MAX_IDLE_WAIT_SECONDS and not token.is_set():
+        time.sleep(IDLE_POLL_SECONDS)
+        waited += IDLE_POLL_SECONDS
+    if token.is_set() or not dataset_store.dataset_exists(dataset_id) or dataset_store.get_version(dataset_id) != version:
+        raise _Cancelled()
+
+
+# --- Scheduling ---
+
+def cancel(dataset_id):
+    """Stops any speculative work for a dataset (it finishes its current step first)."""
+    with _lock:
+        job = _tokens.pop(dataset_id, None)
+    if job:
+        job[1].set()
+
+
+def schedule(dataset_id):
+    """Starts warming the current version of a dataset, replacing any older job for it."""
+    if not _enabled or not dataset_store.dataset_exists(dataset_id):
+        return
+    version = dataset_store.get_version(dataset_id)
+    with _lock:
+        # Another session uploading the same file: its job already warms this version
+        if _tokens.get(dataset_id, (None,))[0] == version:
+            return
+    cancel(dataset_id)
+    token = threading.Event()
+    with _lock:
+        _tokens[dataset_id] = (version, token)
+    _executor.submit(_run, dataset_id, version, token)
+
+
+def _run(dataset_id, version, token):
+    started = time.time()
+    step = 'start'
+    try:
+        _checkpoint(dataset_id, version, token)
+        step = 'frame'
+        dataset_store.load_dataset(dataset_id, copy=False)
+        _checkpoint(dataset_id, version, token)
+        step = 'sample'
+        dataset_store.load_sample(dataset_id)
+        _checkpoint(dataset_id, version, token)
+        step = 'catalog'
+        catalog = schema_catalog.get_catalog(dataset_id)
+        _checkpoint(dataset_id, version, token)
+        step = 'histograms'
+        histograms.precompute(dataset_id)
+        _checkpoint(dataset_id, version, token)
+        step = 'prompt context'
+        prompt_context.get_descriptors(catalog)
+        _checkpoint(dataset_id, version, token)
+        step = 'insights'
+        insight_engine.get_insights(dataset_id)
+        _checkpoint(dataset_id, version, token)
+
+        step = 'dashboard suggestions'
+        configs = ai_chart_generator.get_dashboard_configs_from_data(catalog)
+        _checkpoint(dataset_id, version, token)
+
+        step = 'chart data'
+        df = None
+        for config in configs:
+            spec = chart_query.spec_from_options(config)
+            if chart_query.get_cached_result(spec, catalog) is not None:
+                continue
+            if df is None:
+                df = schema_catalog.apply_catalog_types(dataset_store.load_dataset(dataset_id), catalog)
+            chart_query.run_query(df, spec, catalog)  # Stored in the chart result cache
+            _checkpoint(dataset_id, version, token)
+        print(f"✅ [speculation] Warmed {dataset_id} v{version} in {time.time() - started:.2f}s ({len(configs)} charts).")
+    except _Cancelled:
+        print(f"[speculation] Stopped work on {dataset_id} v{version} at '{step}' (dataset changed).")
+    except Exception as e:
+        print(f"!!! [speculation] Failed at '{step}' for {dataset_id} v{version}: {e}")
+    finally:
+        with _lock:
+            if _tokens.get(dataset_id, (None, None))[1] is token:
+                del _tokens[dataset_id]
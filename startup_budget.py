@@ -0,0 +1,136 @@
+import io
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+"""
+Startup-time budget check.
+Measures, each in a fresh Python process and its own empty folder so nothing is warm:
+- the cold import time of main.py
+- the latency of the FIRST request to each route
+Routes that need data get a dataset uploaded by a separate setup process first, so the
+measured process has not imported or cached anything before its first request.
+Exits with status 1 if any number is over its budget or any route answers with a 5xx,
+so it can run in CI:
+    python startup_budget.py
+Budgets (seconds) can be changed with STARTUP_IMPORT_BUDGET and FIRST_REQUEST_BUDGET.
+Routes that call an AI provider are left out; they depend on the network, not on startup.
+"""
+
+IMPORT_BUDGET = float(os.environ.get('STARTUP_IMPORT_BUDGET', 1.0))
+FIRST_REQUEST_BUDGET = float(os.environ.get('FIRST_REQUEST_BUDGET', 3.0))
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# name -> (method, path, JSON body, needs an uploaded dataset first)
+ROUTES = {
+    'index': ('GET', '/', None, False),
+    'upload page': ('GET', '/upload', None, False),
+    'upload csv': ('POST', '/upload', None, False),
+    'process page': ('GET', '/process', None, True),
+    'data grid': ('POST', '/api/data-grid', {'offset': 0, 'limit': 100, 'include_stats': True}, True),
+    'custom chart page': ('GET', '/custom-chart', None, True),
+    'generate chart': ('POST', '/api/generate-chart', {'chartType': 'bar', 'x_axis': 'region', 'y_axis': 'sales'}, True),
+    'download csv': ('GET', '/download/{filename}?format=csv', None, True),
+    'ai chart page': ('GET', '/ai-chart', None, True),
+    'summary page': ('GET', '/summary-generator', None, False),
+}
+
+
+def _sample_csv(rows=1000):
+    lines = ['date,region,sales'] + [f'2024-01-{i % 28 + 1:02d},R{i % 5},{i * 3 % 101}' for i in range(rows)]
+    return '\n'.join(lines).encode()
+
+
+def _upload(client):
+    return client.post('/upload', data={'file': (io.BytesIO(_sample_csv()), 'budget.csv')}, content_type='multipart/form-data')
+
+
+def _setup():
+    """Runs in its own process: uploads the sample data and returns the resulting session."""
+    import main
+    client = main.app.test_client()
+    _upload(client)
+    with client.session_transaction() as session:
+        return dict(session)
+
+
+def _child(route_name, session_values=None):
+    """Runs inside a fresh process: import the app, then time one first request."""
+    started = time.perf_counter()
+    import main
+    import_seconds = time.perf_counter() - started
+    if route_name is None:
+        return {'import_seconds': import_seconds}
+
+    method, path, body, needs_data = ROUTES[route_name]
+    client = main.app.test_client()
+    if needs_data:
+        # Only the signed session cookie is set here; nothing in the app has run yet
+        with client.session_transaction() as session:
+            session.update(session_values)
+        path = path.format(filename=session_values.get('current_filename', ''))
+
+    started = time.perf_counter()
+    if route_name == 'upload csv':
+        response = _upload(client)
+    else:
+        response = client.open(path, method=method, json=body)
+    response.get_data()  # Streamed responses are only done once fully read
+    return {'import_seconds': import_seconds, 'seconds': time.perf_counter() - started, 'status': response.status_code}
+
+
+def _run_child(args, work_dir, description):
+    """Runs this script with args in a new interpreter (working directory work_dir) and returns its JSON result."""
+    env = dict(os.environ, PYTHONPATH=APP_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    output = subprocess.run([sys.executable, os.path.abspath(__file__)] + args, cwd=work_dir, env=env,
+                            capture_output=True, text=True)
+    for line in reversed(output.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    raise RuntimeError(f"{description} failed:\n{output.stderr[-2000:]}")
+
+
+def _measure(route_name):
+    """Measures one route (or the import, for None) in a fresh process and a fresh folder."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        args = ['--child'] + ([route_name] if route_name else [])
+        if route_name and ROUTES[route_name][3]:
+            session_values = _run_child(['--setup'], work_dir, f"Preparing data for '{route_name}'")
+            args.append(json.dumps(session_values))
+        return _run_child(args, work_dir, f"Measuring '{route_name or 'import'}'")
+
+
+def main():
+    failures = []
+    cold_import = _measure(None)['import_seconds']
+    print(f"{'cold import of main.py':<28}{cold_import:>8.3f}s  (budget {IMPORT_BUDGET:.1f}s)")
+    if cold_import > IMPORT_BUDGET:
+        failures.append('cold import')
+
+    for route_name in ROUTES:
+        result = _measure(route_name)
+        over = result['seconds'] > FIRST_REQUEST_BUDGET
+        broken = result['status'] >= 500
+        note = ('  OVER BUDGET' if over else '') + (f"  (HTTP {result['status']})" if broken else '')
+        print(f"{route_name:<28}{result['seconds']:>8.3f}s  status {result['status']}{note}")
+        if over or broken:
+            failures.append(route_name)
+
+    if failures:
+        print(f"\n!!! Over budget or failing: {', '.join(failures)}")
+        return 1
+    print("\n✅ All startup numbers are within budget.")
+    return 0
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--setup':
+        print(json.dumps(_setup()))
+    elif len(sys.argv) > 1 and sys.argv[1] == '--child':
+        route = sys.argv[2] if len(sys.argv) > 2 else None
+        print(json.dumps(_child(route, json.loads(sys.argv[3]) if len(sys.argv) > 3 else None)))
+    else:
+        sys.exit(main())
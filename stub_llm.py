@@ -0,0 +1,163 @@
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+"""
+A local stand-in for the Groq / OpenRouter chat completions API, for load tests.
+It answers POST .../chat/completions the way the OpenAI-compatible APIs do, after a
+configurable delay, so the app can be load tested without calling (or paying for) a real model:
+- time to first token (latency_ms, with jitter) plus tokens / tokens_per_second
+- "stream": true requests get Server-Sent Events chunks, one per token, then [DONE]
+- JSON-mode requests get a chart config, dashboard prompts get a markdown table,
+  everything else gets plain text
+- error_rate makes a share of the requests fail with HTTP 500 (or 429)
+Point the app at it with GROQ_BASE_URL / OPENROUTER_BASE_URL (see load_test.py), or run it alone:
+    python stub_llm.py --port 8790 --latency-ms 800 --tokens-per-second 200
+"""
+
+DEFAULT_SETTINGS = {
+    'latency_ms': 500,
+    'jitter_ms': 200,
+    'tokens': 120,
+    'tokens_per_second': 250,
+    'error_rate': 0.0,
+    'columns': ['x', 'y'],  # Column names used in the chart suggestions (the last two numeric)
+}
+
+WORDS = ('the data shows a clear pattern where sales grow steadily while costs stay flat across most regions '
+         'with a few outliers in the last quarter that deserve a closer look').split()
+
+
+def _reply_text(body, settings, rng):
+    """Picks a plausible answer for the prompt the app sent."""
+    messages = body.get('messages') or [{}]
+    content = messages[-1].get('content', '')
+    if isinstance(content, list):  # Image prompts: [{'type': 'text', ...}, {'type': 'image_url', ...}]
+        content = ' '.join(part.get('text', '') for part in content if isinstance(part, dict))
+    columns = settings['columns']
+
+    if (body.get('response_format') or {}).get('type') == 'json_object':
+        x, y = columns[0], columns[-1]
+        return json.dumps({'chartType': rng.choice(['bar', 'line', 'pie']), 'x_column': x, 'y_column': y, 'title': f'{y} by {x}'})
+    if 'markdown table' in content:
+        rows = ['| Column X | Column Y | Chart Type |', '|---|---|---|']
+        for chart_type in ('bar', 'line', 'pie'):
+            rows.append(f'| {rng.choice(columns[:-1] or columns)} | {columns[-1]} | {chart_type} |')
+        # The last two columns are taken to be numeric, so the scatter plot is valid
+        rows.append(f'| {columns[-2] if len(columns) > 1 else columns[0]} | {columns[-1]} | scatter |')
+        return '\n'.join(rows)
+    return ' '.join(rng.choice(WORDS) for _ in range(settings['tokens']))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    settings = DEFAULT_SETTINGS
+
+    def log_message(self, format, *args):
+        pass  # One line per request would drown the load test output
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            return self._send_json(200, {'object': 'list', 'data': [{'id': 'stub-model', 'object': 'model'}]})
+        self._send_json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._send_json(400, {'error': {'message': 'Invalid JSON body'}})
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self._send_json(404, {'error': {'message': 'Not found'}})
+
+        settings = self.settings
+        rng = random.Random()
+        time.sleep(max(0.0, settings['latency_ms'] + rng.uniform(-1, 1) * settings['jitter_ms']) / 1000)
+        if rng.random() < settings['error_rate']:
+            status = rng.choice([500, 429])
+            return self._send_json(status, {'error': {'message': f'Stub error {status}', 'type': 'stub_error'}})
+
+        text = _reply_text(body, settings, rng)
+        tokens = text.split(' ')
+        token_delay = 1 / settings['tokens_per_second'] if settings['tokens_per_second'] > 0 else 0
+        completion_id = f'chatcmpl-stub-{rng.getrandbits(48):x}'
+        model = body.get('model', 'stub-model')
+        usage = {'prompt_tokens': len(json.dumps(body.get('messages', []))) // 4,
+                 'completion_tokens': len(tokens)}
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            for i, token in enumerate(tokens):
+                chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                         'choices': [{'index': 0, 'delta': {'content': token if i == 0 else ' ' + token}, 'finish_reason': None}]}
+                self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+                self.wfile.flush()
+                time.sleep(token_delay)
+            last = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                    'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}
+            self.wfile.write(f'data: {json.dumps(last)}\n\ndata: [DONE]\n\n'.encode())
+            self.close_connection = True
+            return
+
+        time.sleep(token_delay * len(tokens))
+        self._send_json(200, {
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            'usage': usage,
+        })
+
+
+def start_stub(port=0, **settings):
+    """Starts the stub in a background thread. Returns (server, base_url); stop it with server.shutdown()."""
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'settings': dict(DEFAULT_SETTINGS, **settings)})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local OpenAI/Groq-compatible stub server for load tests.')
+    parser.add_argument('--port', type=int, default=8790)
+    parser.add_argument('--latency-ms', type=float, default=DEFAULT_SETTINGS['latency_ms'], help='time to first token')
+    parser.add_argument('--jitter-ms', type=float, default=DEFAULT_SETTINGS['jitter_ms'])
+    parser.add_argument('--tokens', type=int, default=DEFAULT_SETTINGS['tokens'], help='length of plain text answers')
+    parser.add_argument('--tokens-per-second', type=float, default=DEFAULT_SETTINGS['tokens_per_second'])
+    parser.add_argument('--error-rate', type=float, default=DEFAULT_SETTINGS['error_rate'])
+    parser.add_argument('--columns', default=','.join(DEFAULT_SETTINGS['columns']), help='column names for chart suggestions')
+    args = parser.parse_args(argv)
+
+    server, base_url = start_stub(
+        args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, tokens=args.tokens,
+        tokens_per_second=args.tokens_per_second, error_rate=args.error_rate, columns=args.columns.split(','))
+    print(f"✅ [stub_llm] Listening on {base_url} (GROQ_BASE_URL={base_url} OPENROUTER_BASE_URL={base_url}/v1)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
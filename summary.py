@@ -1,51 +1,46 @@
-import pandas as pd
-from groq import Groq
-from io import StringIO
+from typing import Optional, TYPE_CHECKING
 
-# Add type hints for better code clarity
-from typing import Optional
+if TYPE_CHECKING:
+    from groq import Groq  # Only for the type hint; the client comes from llm_clients
 
-def generate_ai_summary(df: pd.DataFrame, groq_client: Optional[Groq]) -> str:
+def _findings_prompt_lines(findings) -> str:
+    """One numbered line per finding, most significant first."""
+    return "\n".join(f"{i}. {finding['text']}" for i, finding in enumerate(findings, 1))
+
+def generate_ai_summary(catalog: dict, findings: list, groq_client: Optional["Groq"]) -> str:
     """
-    Takes a DataFrame, samples the first 100 rows, and asks an AI for a summary.
+    Asks an AI to phrase the findings computed by insight_engine as an executive summary.
+    The numbers come from the full dataset; the AI only writes them up.
     """
     if not groq_client:
         raise ConnectionError("Groq client has not been initialized.")
 
-    # --- Step 1: Create a sample of the first 100 rows ---
-    print("### [summary.py] Analyzing the first 100 rows of the dataset...")
-    df_sample = df.head(50)
-    
-    # --- Step 2: Gather Context from the SAMPLE ---
-    buffer = StringIO()
-    # Use the sample for info and describe
-    df_sample.info(buf=buffer)
-    info_str = buffer.getvalue()
-    stats_str = df_sample.describe(include='all').to_string()
-
-    # --- Step 3: Update the Prompt to reflect it's a sample ---
+    print(f"### [summary.py] Phrasing {len(findings)} precomputed findings...")
+    roles = catalog['roles']
+
     prompt = f"""
     You are a senior data analyst providing an executive summary.
-    Below is the structure and statistical summary of the FIRST 100 ROWS of a dataset.
+    The findings below were computed over ALL {catalog['row_count']:,} rows of a dataset and are ranked, most significant first.
 
-    --- DATASET STRUCTURE & INFO (from first 100 rows) ---
-    {info_str}
+    --- DATASET ---
+    Columns: {', '.join(map(str, catalog['columns'][:40]))}{' ...' if len(catalog['columns']) > 40 else ''}
+    Measures: {', '.join(map(str, roles['measure'][:20])) or 'none'}
+    Dimensions: {', '.join(map(str, roles['dimension'][:20])) or 'none'}
+    Date columns: {', '.join(map(str, roles['time'])) or 'none'}
 
-    --- STATISTICAL SUMMARY (from first 100 rows) ---
-    {stats_str}
+    --- FINDINGS ---
+    {_findings_prompt_lines(findings) or 'No strong patterns were found.'}
 
     --- YOUR TASK ---
-    Based ONLY on this sample of the first 100 rows, provide a high-level summary.
+    Write a high-level summary using ONLY these findings. Do not invent numbers or findings.
     Focus on these key points:
-    1.  **Overall Purpose:** What does this dataset appear to be about based on the sample?
-    2.  **Key Columns:** Identify the most important columns in this sample.
-    3.  **Interesting Findings:** Point out trends or stats visible in this 100-row sample.
-    4.  **Potential Issues:** Mention potential data quality issues visible in the sample.
+    1.  **Overall Purpose:** What does this dataset appear to be about?
+    2.  **Key Findings:** The most important findings, in plain business language.
+    3.  **Potential Issues:** Data quality issues among the findings (e.g. missing values), if any.
 
     Format your response with headings and bullet points for readability.
     """
-    
-    # ... (the rest of the function for calling the AI is exactly the same)
+
     try:
         completion = groq_client.chat.completions.create(
             model="llama-3.1-8b-instant",
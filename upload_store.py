@@ -0,0 +1,138 @@
+import os
+import time
+import uuid
+import hashlib
+
+from lazy_imports import lazy_import
+
+dataset_store = lazy_import('dataset_store')
+
+"""
+Content-addressed storage for uploaded files, and the disk quota for uploads/.
+- Uploads are hashed (SHA-256) while they are copied to disk and stored as
+  uploads/raw/<sha256>.<ext>, so the same file is only ever stored once.
+- The dataset id of an upload is derived from its content (and sheet), so uploading
+  an identical file again finds the dataset, and every cache keyed by it, already there.
+- enforce_quota() keeps raw files plus stored datasets under a size limit by
+  deleting the least recently used ones first.
+"""
+
+UPLOAD_FOLDER = 'uploads'
+COPY_CHUNK_BYTES = 1024 * 1024
+QUOTA_BYTES = int(os.environ.get('UPLOAD_QUOTA_BYTES', 2 * 1024 ** 3))  # 2 GiB by default
+
+
+def init_uploads(folder, quota_bytes=None):
+    """Sets the uploads folder (and optionally the quota) and creates the raw file folder."""
+    global UPLOAD_FOLDER, QUOTA_BYTES
+    UPLOAD_FOLDER = folder
+    if quota_bytes is not None:
+        QUOTA_BYTES = int(quota_bytes)
+    os.makedirs(_raw_folder(), exist_ok=True)
+
+
+def _raw_folder():
+    return os.path.join(UPLOAD_FOLDER, 'raw')
+
+
+def raw_path(upload_id):
+    """Path of a stored upload. upload_id is '<sha256>.<ext>' as returned by save_upload."""
+    return os.path.join(_raw_folder(), os.path.basename(upload_id))
+
+
+def save_upload(stream, extension):
+    """
+    Copies an uploaded file stream to disk while hashing it.
+    Returns (upload_id, sha256 hex digest). If the same content is already stored the
+    new copy is dropped and the existing file is reused.
+    """
+    digest = hashlib.sha256()
+    tmp_path = os.path.join(_raw_folder(), f'.incoming-{uuid.uuid4().hex}')
+    with open(tmp_path, 'wb') as out:
+        while True:
+            chunk = stream.read(COPY_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+
+    sha = digest.hexdigest()
+    upload_id = f'{sha}.{extension.lower()}'
+    path = raw_path(upload_id)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+        os.utime(path)  # Counts as a use for the LRU eviction
+        print(f"✅ [upload_store] Same content already stored as {upload_id}, reusing it.")
+    else:
+        os.replace(tmp_path, path)
+    return upload_id, sha
+
+
+def content_dataset_id(sha, sheet_name=None):
+    """Dataset id for an upload: the same file (and sheet) always maps to the same id."""
+    key = sha if not sheet_name else f'{sha}:{sheet_name}'
+    return hashlib.sha256(key.encode()).hexdigest()[:12]
+
+
+# ==============================================================================
+# --- Disk quota ---
+# ==============================================================================
+
+def _folder_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass  # Deleted while we were walking
+    return total
+
+
+def _stored_items():
+    """Everything that counts against the quota: (last used, size, kind, key)."""
+    items = []
+    for folder in (UPLOAD_FOLDER, _raw_folder()):
+        for entry in os.scandir(folder):
+            # Raw uploads, plus files written next to them (e.g. processed_*.csv)
+            if entry.is_file() and not entry.name.startswith('.incoming-'):
+                stat = entry.stat()
+                items.append((stat.st_mtime, stat.st_size, 'file', entry.path))
+    if os.path.isdir(dataset_store.STORE_FOLDER):
+        for entry in os.scandir(dataset_store.STORE_FOLDER):
+            if entry.is_dir():
+                items.append((entry.stat().st_mtime, _folder_size(entry.path), 'dataset', entry.name))
+    return items
+
+
+def enforce_quota(protect=()):
+    """
+    Deletes the least recently used raw files and datasets until uploads/ fits in QUOTA_BYTES.
+    Items in `protect` (dataset ids or file paths, e.g. the ones the current request uses) are kept.
+    Returns the number of bytes freed.
+    """
+    started = time.time()
+    items = _stored_items()
+    total = sum(size for _, size, _, _ in items)
+    if total <= QUOTA_BYTES:
+        return 0
+
+    protected = {os.path.abspath(p) if os.path.sep in str(p) else p for p in protect if p}
+    freed = 0
+    for _, size, kind, key in sorted(items):
+        if total - freed <= QUOTA_BYTES:
+            break
+        if (os.path.abspath(key) if kind == 'file' else key) in protected:
+            continue
+        if kind == 'file':
+            try:
+                os.remove(key)
+            except OSError:
+                continue
+        else:
+            dataset_store.delete_dataset(key)
+        freed += size
+        print(f"✅ [upload_store] Evicted {kind} {key} ({size / 1024 ** 2:.1f} MB).")
+    print(f"✅ [upload_store] Quota check freed {freed / 1024 ** 2:.1f} MB in {time.time() - started:.2f}s "
+          f"({(total - freed) / 1024 ** 2:.1f} of {QUOTA_BYTES / 1024 ** 2:.0f} MB used).")
+    return freed